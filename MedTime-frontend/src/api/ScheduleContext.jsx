@@ -17,8 +17,9 @@ export const SchedulesProvider = ({ children }) => {
     if (!hasFetched) {
       try {
         setLoading(true);
-        const response = await api.get(import.meta.env.VITE_SCHEDULES_URL);
-        setSchedules(response.data);
+        // only the next pending doses; the full history is paginated oldest first
+        const response = await api.get(import.meta.env.VITE_SCHEDULES_URL, { params: { upcoming: 50 } });
+        setSchedules(response.data.results ?? response.data);
         setHasFetched(true);
       } catch (error) {
         console.error('Error fetching schedules:', error);
@@ -0,0 +1,9 @@
+import api from './axiosInterceptor';
+
+// Fetch one page of a cursor-paginated list; pass a page's `next` link (and no params) for the page after it
+const fetchPage = async (url, params = {}) => {
+  const { data } = await api.get(url, { params });
+  return { results: data.results ?? data, next: data.next ?? null };
+};
+
+export default fetchPage;
@@ -1,17 +1,23 @@
+import fetchPage from './fetchPage';
+
 // Fetch schedules function to be used in CreateMedicationForm and Schedules components
 const fetchSchedules = async () => {
   try {
-    const response = await axios.get(import.meta.env.VITE_SCHEDULES_URL); // Make sure the URL is correct
-    const data = response.data;
-
-    // Process the schedule data, separating upcoming and previous schedules
+    // the next pending doses and the last week of history, not every page since the first dose
     const now = new Date();
-    const upcoming = data.filter((schedule) => new Date(schedule.next_dose_due_at) >= now);
-    const previous = data.filter((schedule) => new Date(schedule.next_dose_due_at) < now);
+    const weekAgo = new Date(now.getTime() - 7 * 24 * 60 * 60 * 1000);
+    const [upcoming, previous] = await Promise.all([
+      fetchPage(import.meta.env.VITE_SCHEDULES_URL, { upcoming: 50 }),
+      fetchPage(import.meta.env.VITE_SCHEDULES_URL, {
+        due_after: weekAgo.toISOString(),
+        due_before: now.toISOString(),
+        page_size: 50,
+      }),
+    ]);
 
     // Update state with the fetched schedules
-    setUpcomingSchedules(upcoming);
-    setPreviousSchedules(previous);
+    setUpcomingSchedules(upcoming.results);
+    setPreviousSchedules(previous.results);
   } catch (error) {
     console.error("Error fetching schedules", error);
     toast.error("Failed to fetch schedules.");
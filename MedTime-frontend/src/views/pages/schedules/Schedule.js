@@ -1,18 +1,29 @@
 import React, { useEffect, useState } from 'react';
-import { CTable, CTableBody, CTableRow, CTableHeaderCell, CTableDataCell, CTableHead } from '@coreui/react';
-import api from '../../../api/axiosInterceptor';
-import { format } from 'date-fns'; // For formatting date
+import { CButton, CTable, CTableBody, CTableRow, CTableHeaderCell, CTableDataCell, CTableHead } from '@coreui/react';
+import fetchPage from '../../../api/fetchPage';
+import { format, subDays } from 'date-fns'; // For formatting date
+
+const emptyPage = { results: [], next: null };
 
 const Schedules = () => {
-  const [schedules, setSchedules] = useState([]);
+  const [upcoming, setUpcoming] = useState(emptyPage);
+  const [missed, setMissed] = useState(emptyPage);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  // Fetch schedules from API
+  // Fetch the first page of each list; older pages are only fetched on "Load more"
   const fetchSchedules = async () => {
     try {
-      const response = await api.get(import.meta.env.VITE_SCHEDULES_URL); // Replace with correct endpoint
-      setSchedules(response.data);
+      const [upcomingPage, missedPage] = await Promise.all([
+        fetchPage(import.meta.env.VITE_SCHEDULES_URL, { upcoming: 50 }),
+        fetchPage(import.meta.env.VITE_SCHEDULES_URL, {
+          status: 'missed',
+          due_after: subDays(new Date(), 7).toISOString(),
+          page_size: 50,
+        }),
+      ]);
+      setUpcoming(upcomingPage);
+      setMissed(missedPage);
       setLoading(false);
     } catch (err) {
       setError('Failed to fetch schedules');
@@ -20,13 +31,22 @@ const Schedules = () => {
     }
   };
 
+  // Append the page after the last one shown
+  const loadMore = async (page, setPage) => {
+    try {
+      const nextPage = await fetchPage(page.next);
+      setPage({ results: [...page.results, ...nextPage.results], next: nextPage.next });
+    } catch (err) {
+      setError('Failed to fetch schedules');
+    }
+  };
+
   useEffect(() => {
     fetchSchedules();
   }, []);
 
-  // Filter schedules based on status
-  const upcomingSchedules = schedules.filter(schedule => schedule.status === 'scheduled');
-  const missedSchedules = schedules.filter(schedule => schedule.status === 'missed');
+  const upcomingSchedules = upcoming.results;
+  const missedSchedules = missed.results;
 
   return (
     <div>
@@ -63,9 +83,12 @@ const Schedules = () => {
           ) : (
             <p>No upcoming schedules found.</p>
           )}
+          {upcoming.next && (
+            <CButton color="secondary" onClick={() => loadMore(upcoming, setUpcoming)}>Load more</CButton>
+          )}
 
           {/* Missed Schedules */}
-          <h4>Missed Schedules</h4>
+          <h4>Missed Schedules (last 7 days)</h4>
           {missedSchedules.length > 0 ? (
             <CTable hover striped responsive color="danger">
               <CTableHead>
@@ -90,6 +113,9 @@ const Schedules = () => {
           ) : (
             <p>No missed schedules found.</p>
           )}
+          {missed.next && (
+            <CButton color="secondary" onClick={() => loadMore(missed, setMissed)}>Load more</CButton>
+          )}
         </>
       )}
     </div>
@@ -63,7 +63,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     )
 }
 
@@ -72,7 +72,14 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.BlacklistFilterTokenRefreshSerializer",
 }
+# verified access tokens kept in memory by users.authentication.CachedJWTAuthentication (per process,
+# each entry for at most ACCESS_TOKEN_LIFETIME)
+JWT_VERIFIED_TOKEN_CACHE_SIZE = env.int('JWT_VERIFIED_TOKEN_CACHE_SIZE', default=10000)
+# Bloom filter of blacklisted refresh tokens (users.blacklist): expected entries and seconds between syncs
+JWT_BLACKLIST_FILTER_CAPACITY = env.int('JWT_BLACKLIST_FILTER_CAPACITY', default=100000)
+JWT_BLACKLIST_FILTER_MAX_AGE = env.int('JWT_BLACKLIST_FILTER_MAX_AGE', default=60)
 
 
 MIDDLEWARE = [
@@ -117,6 +124,21 @@ DATABASES = {
     }
 }
 
+# Shared cache (OTP codes, authenticated users, API responses). Point CACHE_URL at
+# Redis or Memcached in production so every worker sees the same entries,
+# e.g. CACHE_URL=rediscache://127.0.0.1:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# Whether every worker sees the same cache. Cached API responses, agendas and users are
+# only kept then: with the per-process locmem default, a write handled by another process
+# (the sweeper, the dispatcher, another worker) could not invalidate them.
+SHARED_CACHE = env.bool('SHARED_CACHE', default='CACHE_URL' in env.ENVIRON)
+# Seconds a cached list/retrieve response of the medication and schedule APIs is kept
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=300)
+# Serve the medication and schedule lists from .values() (utility.fast_serializers); same JSON, less CPU
+FAST_LIST_SERIALIZERS = env.bool('FAST_LIST_SERIALIZERS', default=False)
+
 # set our custom django AUTH USER MODEL
 AUTH_USER_MODEL = 'users.User'
 
@@ -169,6 +191,25 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = 'info@obamsauth.com'
+EMAIL_POOL_SIZE = env.int('EMAIL_POOL_SIZE', default=4)  # long-lived SMTP connections per process
+
+# Where one time passcodes live: users.otp.CacheOTPStore or users.otp.ModelOTPStore.
+# Codes only go in the cache when it is shared (SHARED_CACHE); the default locmem cache
+# is per process, so a code issued by one worker would not verify on another.
+OTP_STORE_BACKEND = env(
+    'OTP_STORE_BACKEND', default='users.otp.CacheOTPStore' if SHARED_CACHE else 'users.otp.ModelOTPStore'
+)
+
+# Store each medication's future doses as a recurrence rule (schedules.ScheduleRule)
+# instead of one Schedule row per dose; only doses with an event are stored as rows.
+# Rule doses are reminded, swept as missed and recorded (POST /schedules/record/) like stored ones
+SCHEDULE_VIRTUAL_RULES = env.bool('SCHEDULE_VIRTUAL_RULES', default=False)
+
+# Doses of one user due within this many minutes of each other share a reminder
+REMINDER_COALESCE_MINUTES = env.int('REMINDER_COALESCE_MINUTES', default=10)
+
+# Medications forecast to run out within this many days get a refill alert
+REFILL_ALERT_LEAD_DAYS = env.int('REFILL_ALERT_LEAD_DAYS', default=5)
 
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'  # Use Redis as a broker
@@ -17,9 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from utility.exporter import ExportView
+from utility.response_cache import ResponseCacheStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/auth/', include('users.urls')),  # user auth endpoint
     path('api/v1/', include('medications.urls')), # medication endpoints
     path('api/v1/', include('schedules.urls')),
+    path('api/v1/export/', ExportView.as_view(), name='export'),  # streamed medication history
+    path('api/v1/cache-stats/', ResponseCacheStatsView.as_view(), name='cache-stats'),  # response cache hit ratio
 ]
@@ -0,0 +1,39 @@
+"""Import medications from an NDJSON or CSV file"""
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import User
+from utility.importer import FORMATS, format_for, import_medications
+
+
+class Command(BaseCommand):
+    help = "Stream an NDJSON or CSV file of medications into the database for one user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, one medication per line or CSV row.")
+        parser.add_argument('--user', required=True, help="Email of the user who owns the medications.")
+        parser.add_argument('--format', choices=FORMATS, dest='file_format',
+                            help="File format (default: guessed from the file extension).")
+        parser.add_argument('--start-time', help="ISO 8601 time of the first doses (default: now).")
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Rows validated and inserted per transaction (default: 1000).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist as error:
+            raise CommandError(f"No user with email {options['user']}") from error
+
+        file_format = options['file_format'] or format_for(options['path'])
+        with open(options['path'], 'rb') as stream:
+            report = import_medications(
+                user, stream, file_format, options['start_time'], chunk_size=options['chunk_size']
+            )
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        if report.failed > len(report.errors):
+            self.stderr.write(f"... and {report.failed - len(report.errors)} more rows with errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} medications, {report.failed} rows failed "
+            f"({report.elapsed:.1f}s, {report.rows_per_second:.0f} rows/s)."
+        ))
@@ -0,0 +1,37 @@
+"""Recompute the run-out forecast of every active medication"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from medications.models import Medication
+
+
+class Command(BaseCommand):
+    help = ("Recompute runs_out_at for every active medication (and clear it on finished ones). Dose events keep forecasts current on their own, "
+            "so this is for filling in existing rows and for repairs. Medications are read by primary key in chunks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Medications per chunk (default: 2000).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        last_id = 0
+        total = 0
+        changed = 0
+        while True:
+            ids = list(
+                Medication.objects.filter(Q(status='active') | Q(runs_out_at__isnull=False), pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            changed += len(Medication.objects.filter(pk__in=ids).refresh_forecasts())
+            total += len(ids)
+            self.stdout.write(f"{total} medications forecast")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {total} medications ({changed} changed) in {time.perf_counter() - started:.1f}s."
+        ))
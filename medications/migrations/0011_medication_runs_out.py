@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0010_remove_medication_last_scheduled_time'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='refill_alerted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='runs_out_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['runs_out_at'], name='medication_runs_out_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Max, Min, Q, Value, When
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
@@ -7,9 +10,86 @@ from dateutil import parser
 
 
 from users.models import User
+from utility.response_cache import bump_response_version
 
 # Create your models here.
 
+class MedicationQuerySet(models.QuerySet):
+    """Stock ledger operations that run as single UPDATE statements"""
+
+    def consume_doses(self, doses=1):
+        """Take `doses` intakes out of stock for every medication in the queryset.
+
+        The decrement is computed by the database from the current row, so
+        concurrent dose events never overwrite each other. Medications that run
+        out are flipped to completed by the same statement.
+        """
+        used = F('dosage_per_intake') * doses
+        return self.update(
+            total_left=Greatest(F('total_left') - used, 0),
+            status=Case(When(total_left__lte=used, then=Value('completed')), default=F('status')),
+            updated_at=timezone.now(),
+        )
+
+    def apply_dose_events(self, medication_ids):
+        """Apply many dose events at once.
+
+        Args:
+            medication_ids (iterable): one medication id per taken or missed dose
+
+        Medications are grouped by how many doses they lost, so this costs one
+        UPDATE per distinct dose count rather than one per event.
+        """
+        medications_by_count = defaultdict(list)
+        for medication_id, count in Counter(medication_ids).items():
+            medications_by_count[count].append(medication_id)
+        with transaction.atomic():
+            for count, ids in medications_by_count.items():
+                self.filter(pk__in=ids).consume_doses(count)
+
+    def with_forecast_inputs(self):
+        """Annotate what forecast_runs_out needs: the earliest pending dose, the latest dose and the rule."""
+        return self.annotate(
+            next_pending_dose=Min('schedule__next_dose_due_at', filter=Q(schedule__status='scheduled')),
+            last_dose=Max('schedule__next_dose_due_at'),
+            rule_anchor=F('schedule_rule__anchor'),
+            rule_interval=F('schedule_rule__interval'),
+            rule_count=F('schedule_rule__count'),
+        )
+
+    def refresh_forecasts(self):
+        """Recompute runs_out_at for every medication in the queryset.
+
+        The inputs of all medications are read with one grouped SELECT, the
+        forecasts are computed in memory and only the rows whose forecast moved
+        are written back, with one bulk UPDATE that also stamps updated_at. A
+        forecast that moves later (or goes away) clears refill_alerted_at, so the
+        next shortage is alerted too. bulk_update sends no signals, so the
+        owners' cached responses are dropped here.
+
+        Returns:
+            dict: {medication id: new runs_out_at} for the rows that changed
+        """
+        changed = []
+        now = timezone.now()
+        for medication in self.with_forecast_inputs():
+            runs_out_at = medication.forecast_runs_out()
+            if runs_out_at == medication.runs_out_at:
+                continue
+            if runs_out_at is None or medication.runs_out_at is None or runs_out_at > medication.runs_out_at:
+                medication.refill_alerted_at = None
+            medication.runs_out_at = runs_out_at
+            medication.updated_at = now
+            changed.append(medication)
+        self.model.objects.bulk_update(changed, ['runs_out_at', 'refill_alerted_at', 'updated_at'])
+        bump_response_version(*(medication.user_id for medication in changed))
+        return {medication.pk: medication.runs_out_at for medication in changed}
+
+    def running_out(self, before):
+        """Active medications forecast to run out by `before`, soonest first."""
+        return self.filter(status='active', runs_out_at__lte=before).order_by('runs_out_at', 'pk')
+
+
 class Medication(models.Model):
     """Class for each medication added by user"""
     STATUS_CHOICES = [
@@ -27,11 +107,21 @@ class Medication(models.Model):
     priority_flag = models.BooleanField(default=False)  # Is it a priority drug?
     priority_lead_time = models.PositiveIntegerField(null=True, blank=True)  # Gap in minutes for priority drugs
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='active')
+    runs_out_at = models.DateTimeField(null=True, blank=True)  # Forecast, see forecast_runs_out
+    refill_alerted_at = models.DateTimeField(null=True, blank=True)  # Last refill alert for that forecast
     
     # Timestamps for creation and updates
     created_at = models.DateTimeField(auto_now_add=True)  # Auto-set on creation
     updated_at = models.DateTimeField(auto_now=True)  # Auto-updated on modification
 
+    objects = MedicationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # "who runs out this week" and the refill alert job
+            models.Index(fields=['runs_out_at'], condition=models.Q(status='active'), name='medication_runs_out_idx'),
+        ]
+
     def __str__(self):
         return f"{self.drug_name} for {self.user}"
 
@@ -72,36 +162,64 @@ class Medication(models.Model):
         if isinstance(last_scheduled_time, str):
             last_scheduled_time = parser.isoparse(last_scheduled_time)
 
+        interval = self.dose_interval()
+        if interval is None:
+            # If no time interval or frequency is provided, return None
+            return None
+        return last_scheduled_time + interval
+
+    def dose_interval(self):
+        """Return the gap between two consecutive doses as a timedelta.
+
+        Has no side effects, so batch callers can compute next times in memory.
+        """
         # Handle priority drug
         if self.priority_flag:
-            # For priority drugs, add the time interval to the last scheduled time
-            return last_scheduled_time + timedelta(hours=self.time_interval)
-        else:
-            # For non-priority drugs, calculate based on the provided time interval or frequency
-            if self.time_interval:
-                # If time_interval is defined, calculate the next schedule based on it
-                return last_scheduled_time + timedelta(hours=self.time_interval)
-            elif self.frequency_per_day:
-                # If frequency is defined, calculate based on frequency
-                return last_scheduled_time + timedelta(hours=24 / self.frequency_per_day)
-
-        # If no time interval or frequency is provided, return None
+            # For priority drugs, the time interval is mandatory
+            return timedelta(hours=self.time_interval)
+        # For non-priority drugs, calculate based on the provided time interval or frequency
+        if self.time_interval:
+            return timedelta(hours=self.time_interval)
+        if self.frequency_per_day:
+            return timedelta(hours=24 / self.frequency_per_day)
         return None
 
-    def update_quantity(self, dose_taken=True):
-        """Update the total left quantity and check for completion."""
-        
-        # If no doses remain, mark medication as completed
-        if self.is_completed():
-            self.status = 'completed'
+    def forecast_runs_out(self):
+        """Due time of the first dose the stock no longer covers.
+
+        Needs the with_forecast_inputs annotations. A schedule rule covers
+        `count` doses from its anchor. Otherwise the series starts at the
+        earliest pending dose, or one interval after the latest dose, and every
+        dose from there on takes dosage_per_intake out of total_left.
+        """
+        if self.status != 'active':
             return None
-        
-        if dose_taken:
-            self.total_left -= self.dosage_per_intake
+        if self.rule_anchor is not None:
+            return self.rule_anchor + self.rule_count * self.rule_interval
+        interval = self.dose_interval()
+        if interval is None:
+            return None
+        if self.next_pending_dose is not None:
+            first = self.next_pending_dose
+        elif self.last_dose is not None:
+            first = self.last_dose + interval
         else:
-            self.total_left -= self.dosage_per_intake  # Or some other rule for missed doses
-        
-        self.save()
+            return None
+        return first + ((self.total_left or 0) // self.dosage_per_intake) * interval
+
+    def update_quantity(self, dose_taken=True):
+        """Update the total left quantity and check for completion.
+
+        The decrement, the forecast and the re-read run in one transaction, so
+        a failure part way leaves the stock untouched and the call can be retried.
+        """
+        # Missed doses use the same rule as taken ones (dose_taken is kept for callers)
+        medications = Medication.objects.filter(pk=self.pk)
+        with transaction.atomic():
+            medications.consume_doses(1)
+            medications.refresh_forecasts()
+            self.refresh_from_db(fields=['total_left', 'status', 'updated_at', 'runs_out_at', 'refill_alerted_at'])
+        bump_response_version(self.user_id)  # update() sends no post_save
 
     def is_completed(self):
         """Check if the medication is fully consumed."""
@@ -1,22 +1,53 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
+from utility.response_cache import bump_response_version
 from .models import Medication
 
+
+class MedicationListSerializer(serializers.ListSerializer):
+    """Creates a whole list of medications with a single bulk INSERT."""
+
+    def create(self, validated_data):
+        user = self.context['request'].user
+        medications = []
+        for data in validated_data:
+            data = {**data, 'user': user}
+            data['total_left'] = data['total_quantity']  # what Medication.save does on creation
+            medications.append(Medication(**data))
+        with transaction.atomic():
+            medications = Medication.objects.bulk_create(medications)
+            bump_response_version(user.pk)  # bulk_create sends no post_save
+        return medications
+
+
 class MedicationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Medication
         fields = [
             'id', 'drug_name', 'total_quantity', 'total_left', 'dosage_per_intake', 
             'frequency_per_day', 'time_interval', 'priority_flag', 
-            'priority_lead_time', 'status', 'created_at', 'updated_at'
+            'priority_lead_time', 'status', 'runs_out_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'runs_out_at', 'created_at', 'updated_at']
+        list_serializer_class = MedicationListSerializer
+
+    def validate(self, attrs):
+        """Run the model's own checks here, so bulk_create can skip Medication.save."""
+        if attrs.get('total_quantity', 1) <= 0:
+            raise serializers.ValidationError({'total_quantity': 'Total quantity must be a positive integer.'})
+        instance = Medication(**{**self._current_values(), **attrs})
+        try:
+            instance.clean()
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.message_dict) from error
+        return attrs
+
+    def _current_values(self):
+        if self.instance is None or isinstance(self.instance, list):
+            return {}
+        return {field: getattr(self.instance, field) for field in self.Meta.fields if field != 'id'}
 
     def create(self, validated_data):
         user = self.context['request'].user
-        if isinstance(validated_data, list):
-            # Handle bulk creation
-            medications = [Medication.objects.create(**{**data, 'user': user}) for data in validated_data]
-            return medications
-        else:
-            # Handle single record creation
-            return Medication.objects.create(**{**validated_data, 'user': user})
+        return Medication.objects.create(**{**validated_data, 'user': user})
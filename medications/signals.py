@@ -0,0 +1,19 @@
+"""Signal handlers for the medication model"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utility.response_cache import bump_response_version
+from .models import Medication
+
+
+@receiver([post_save, post_delete], sender=Medication)
+def invalidate_cached_responses(sender, instance, **kwargs):
+    """Drop the owner's cached medication and schedule responses."""
+    bump_response_version(instance.user_id)
+
+
+@receiver(post_save, sender=Medication)
+def refresh_forecast(sender, instance, created, **kwargs):
+    """Re-forecast an edited medication; new ones have no doses to forecast from yet."""
+    if not created:
+        Medication.objects.filter(pk=instance.pk).refresh_forecasts()
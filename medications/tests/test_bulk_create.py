@@ -0,0 +1,63 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+
+
+def regimen(count, **overrides):
+    return [
+        {'drug_name': f'Drug {index}', 'total_quantity': 20, 'dosage_per_intake': 1, 'time_interval': 8, **overrides}
+        for index in range(count)
+    ]
+
+
+class BulkMedicationCreateTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='bulk@example.com', first_name='Bulk', last_name='Create', password='securepassword123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def post(self, medications, **extra):
+        return self.client.post('/api/v1/medications/', {'medications': medications, **extra}, format='json')
+
+    def test_creates_medications_and_first_doses(self):
+        response = self.post(regimen(3), start_time='2030-01-01T08:00:00Z')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['total_left'] for item in response.data], [20, 20, 20])
+        self.assertTrue(all(item['id'] for item in response.data))
+        self.assertEqual(Schedule.objects.filter(medication__user=self.user).count(), 3)
+
+    def test_start_time_defaults_to_now(self):
+        response = self.post(regimen(1))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Schedule.objects.filter(medication_id=response.data[0]['id']).exists())
+
+    def test_query_count_does_not_grow_with_the_list(self):
+        def queries_for(count):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(regimen(count)).status_code, 201)
+            return len(queries)
+
+        self.assertEqual(queries_for(2), queries_for(40))
+
+    def test_one_invalid_item_rejects_the_whole_list(self):
+        medications = regimen(2) + [{'drug_name': 'Broken', 'total_quantity': 5, 'dosage_per_intake': 1,
+                                     'priority_flag': True, 'time_interval': 8}]
+        response = self.post(medications)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('priority_lead_time', response.data[2])
+        self.assertFalse(Medication.objects.exists())
+
+    def test_zero_quantity_is_rejected(self):
+        response = self.post(regimen(1, total_quantity=0))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('total_quantity', response.data[0])
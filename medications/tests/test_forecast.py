@@ -0,0 +1,168 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from reminders.utils import send_refill_alerts
+from schedules.models import Schedule
+from users.models import User
+from utility.response_cache import response_version
+from utility.scheduler import initial_schedule
+
+
+class RunOutForecastTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='forecast@example.com', first_name='Fore', last_name='Cast', password='securepassword123'
+        )
+        self.start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+
+    def make_medication(self, total_quantity=10, **fields):
+        medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=total_quantity, dosage_per_intake=1,
+            time_interval=8, **fields
+        )
+        initial_schedule([medication], self.start)
+        return medication
+
+    def test_new_medication_runs_out_after_its_last_covered_dose(self):
+        medication = self.make_medication()
+        self.assertEqual(medication.runs_out_at, self.start + timedelta(hours=80))
+        medication.refresh_from_db()
+        self.assertEqual(medication.runs_out_at, self.start + timedelta(hours=80))
+
+    @override_settings(SCHEDULE_VIRTUAL_RULES=True)
+    def test_schedule_rule_forecast(self):
+        medication = self.make_medication(total_quantity=6)
+        self.assertEqual(medication.runs_out_at, self.start + timedelta(hours=48))
+
+    def test_dose_events_keep_an_on_time_forecast(self):
+        medication = self.make_medication()
+        Schedule.objects.get(medication=medication).mark_as_fulfilled()
+
+        medication.refresh_from_db()
+        self.assertEqual((medication.total_left, medication.runs_out_at), (9, self.start + timedelta(hours=80)))
+
+    def test_extra_dose_moves_the_forecast_earlier(self):
+        medication = self.make_medication()
+        medication.update_quantity()  # stock used without the schedule moving
+        self.assertEqual(medication.runs_out_at, self.start + timedelta(hours=72))
+
+    def test_editing_the_regimen_reforecasts(self):
+        medication = self.make_medication()
+        medication.dosage_per_intake = 2
+        medication.save()
+
+        medication.refresh_from_db()
+        self.assertEqual(medication.runs_out_at, self.start + timedelta(hours=40))
+
+    def test_finished_medication_has_no_forecast(self):
+        medication = self.make_medication(total_quantity=1)
+        Schedule.objects.get(medication=medication).mark_as_fulfilled()
+
+        medication.refresh_from_db()
+        self.assertEqual((medication.status, medication.runs_out_at), ('completed', None))
+
+    def test_refresh_command_fills_missing_forecasts(self):
+        medication = self.make_medication()
+        Medication.objects.update(runs_out_at=None)
+
+        call_command('refresh_forecasts', chunk_size=1, stdout=StringIO())
+
+        medication.refresh_from_db()
+        self.assertEqual(medication.runs_out_at, self.start + timedelta(hours=80))
+
+    def test_refresh_stamps_updated_at_and_drops_cached_responses(self):
+        medication = self.make_medication()
+        Medication.objects.update(runs_out_at=None, updated_at=self.start - timedelta(days=1))
+        version = response_version(self.user.pk)
+
+        Medication.objects.filter(pk=medication.pk).refresh_forecasts()
+
+        medication.refresh_from_db()
+        self.assertGreater(medication.updated_at, self.start - timedelta(days=1))
+        self.assertNotEqual(response_version(self.user.pk), version)
+
+    def test_status_patch_updates_stock_and_forecast(self):
+        medication = self.make_medication()
+        schedule = Schedule.objects.get(medication=medication)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.patch(f'/api/v1/schedules/{schedule.pk}/', {'status': 'fulfilled'})
+
+        self.assertEqual(response.status_code, 200)
+        medication.refresh_from_db()
+        self.assertEqual((medication.total_left, medication.runs_out_at), (9, self.start + timedelta(hours=80)))
+
+    def test_running_out_endpoint(self):
+        soon = self.make_medication(total_quantity=3)
+        self.make_medication(total_quantity=60)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get('/api/v1/medications/running-out/', {'within': '2d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [soon.pk])
+        self.assertEqual(len(client.get('/api/v1/medications/running-out/', {'within': '4w'}).data), 2)
+        self.assertEqual(client.get('/api/v1/medications/running-out/', {'within': 'soon'}).status_code, 400)
+
+
+@patch('reminders.utils.send_normal_email_now', return_value=True)
+class RefillAlertTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='refill@example.com', first_name='Re', last_name='Fill', password='securepassword123'
+        )
+        self.start = timezone.now() + timedelta(hours=1)
+        self.medications = [
+            Medication.objects.create(user=self.user, drug_name=f'Drug {index}', total_quantity=quantity,
+                                      dosage_per_intake=1, time_interval=24)
+            for index, quantity in enumerate((2, 3, 30))
+        ]
+        initial_schedule(self.medications, self.start)
+
+    def test_one_email_per_user_and_one_alert_per_forecast(self, send_email):
+        self.assertEqual(send_refill_alerts(timedelta(days=5)), 2)
+        send_email.assert_called_once()
+        self.assertIn('Drug 0', send_email.call_args.args[0]['email_body'])
+        self.assertNotIn('Drug 2', send_email.call_args.args[0]['email_body'])
+
+        self.assertEqual(send_refill_alerts(timedelta(days=5)), 0)
+        send_email.assert_called_once()
+
+    def test_alerts_again_after_the_forecast_moves_later(self, send_email):
+        send_refill_alerts(timedelta(days=5))
+        medication = self.medications[0]
+        Medication.objects.filter(pk=medication.pk).update(total_left=20)  # refilled
+        Medication.objects.filter(pk=medication.pk).refresh_forecasts()
+        Medication.objects.filter(pk=medication.pk).update(total_left=1)
+        Medication.objects.filter(pk=medication.pk).refresh_forecasts()
+
+        self.assertEqual(send_refill_alerts(timedelta(days=5)), 1)
+
+    def test_failed_alerts_are_not_stamped_and_are_retried(self, send_email):
+        send_email.return_value = False
+        self.assertEqual(send_refill_alerts(timedelta(days=5)), 0)
+        self.assertFalse(Medication.objects.filter(refill_alerted_at__isnull=False).exists())
+
+        send_email.return_value = True
+        self.assertEqual(send_refill_alerts(timedelta(days=5)), 2)
+
+
+class RefillAlertDeliveryTest(TestCase):
+    def test_alert_is_delivered_before_the_command_returns(self):
+        user = User.objects.create_user(
+            email='deliver@example.com', first_name='De', last_name='Liver', password='securepassword123'
+        )
+        medication = Medication.objects.create(user=user, drug_name='Drug A', total_quantity=2,
+                                               dosage_per_intake=1, time_interval=24)
+        initial_schedule([medication], timezone.now() + timedelta(hours=1))
+
+        call_command('send_refill_alerts', stdout=StringIO())
+
+        self.assertEqual([message.to for message in mail.outbox], [['deliver@example.com']])
@@ -0,0 +1,93 @@
+import threading
+import time
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from users.models import User
+from medications.models import Medication
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ledger@example.com',
+            first_name='Led',
+            last_name='Ger',
+            password='securepassword123',
+            is_verified=True
+        )
+
+    def make_medication(self, total_quantity=10, dosage_per_intake=2):
+        return Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=total_quantity,
+            dosage_per_intake=dosage_per_intake, time_interval=8,
+        )
+
+    def test_update_quantity_decrements_and_completes(self):
+        medication = self.make_medication(total_quantity=4)
+
+        medication.update_quantity()
+        self.assertEqual((medication.total_left, medication.status), (2, 'active'))
+
+        medication.update_quantity(dose_taken=False)
+        self.assertEqual((medication.total_left, medication.status), (0, 'completed'))
+
+    def test_stock_never_goes_below_zero(self):
+        medication = self.make_medication(total_quantity=3)
+        Medication.objects.filter(pk=medication.pk).consume_doses(5)
+        medication.refresh_from_db()
+        self.assertEqual((medication.total_left, medication.status), (0, 'completed'))
+
+    def test_apply_dose_events_groups_by_dose_count(self):
+        first, second, third = self.make_medication(), self.make_medication(), self.make_medication()
+
+        with self.assertNumQueries(4):  # savepoint, two UPDATEs, release
+            Medication.objects.apply_dose_events([first.pk, second.pk, first.pk, third.pk])
+
+        self.assertEqual(
+            list(Medication.objects.order_by('pk').values_list('total_left', flat=True)),
+            [6, 8, 8],
+        )
+
+
+class ConcurrentStockLedgerTest(TransactionTestCase):
+    THREADS = 8
+    EVENTS_PER_THREAD = 25
+    MAX_ATTEMPTS = 200  # per event, so a lock that is never released fails the test instead of hanging it
+
+    def test_concurrent_dose_events_lose_no_decrements(self):
+        user = User.objects.create_user(
+            email='stress@example.com', first_name='Stress', last_name='Test', password='securepassword123'
+        )
+        total = self.THREADS * self.EVENTS_PER_THREAD
+        medication = Medication.objects.create(
+            user=user, drug_name='Drug A', total_quantity=total + 10, dosage_per_intake=1, time_interval=8
+        )
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def record_doses():
+            try:
+                start.wait()
+                for _ in range(self.EVENTS_PER_THREAD):
+                    for attempt in range(self.MAX_ATTEMPTS):
+                        try:
+                            Medication.objects.get(pk=medication.pk).update_quantity()
+                            break
+                        except OperationalError:  # SQLite table lock; the event rolled back, so retry it
+                            time.sleep(0.001)
+                    else:
+                        raise AssertionError(f"Database still locked after {self.MAX_ATTEMPTS} attempts")
+            except Exception as e:  # surface failures from the worker threads
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=record_doses) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        medication.refresh_from_db()
+        self.assertEqual(medication.total_left, 10)
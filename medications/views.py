@@ -1,20 +1,31 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from .models import Medication
 from .serializers import MedicationSerializer
+from utility.conditional import ConditionalListMixin
+from utility.response_cache import CachedResponseMixin
+from utility.fast_serializers import FastListMixin, ValuesSerializer
+from utility.importer import FORMATS, format_for, import_medications
 from utility.scheduler import create_next_schedule, initial_schedule
+from utility.timeline import parse_horizon
 
 # LOGGIN ERRORS
 import logging
 
 logger = logging.getLogger(__name__)
 
-class MedicationViewSet(viewsets.ModelViewSet):
+class MedicationViewSet(ConditionalListMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Medication.objects.all()
     serializer_class = MedicationSerializer
+    fast_serializer = ValuesSerializer(MedicationSerializer)  # list path when FAST_LIST_SERIALIZERS is on
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -36,11 +47,12 @@ class MedicationViewSet(viewsets.ModelViewSet):
         # Validate the serializer
         serializer.is_valid(raise_exception=True)
 
-        # Save the medications
-        medications = serializer.save(user=request.user)
+        with transaction.atomic():
+            # Save the medications in one bulk INSERT
+            medications = serializer.save(user=request.user)
 
-        # Create initial schedules ONLY for the medications created in this request
-        initial_schedule(medications, start_time)
+            # Create initial schedules ONLY for the medications created in this request
+            initial_schedule(medications, start_time)
 
         # Respond with serialized data
         return Response(MedicationSerializer(medications, many=True).data, status=status.HTTP_201_CREATED)
@@ -56,3 +68,29 @@ class MedicationViewSet(viewsets.ModelViewSet):
             {"message": f"Successfully deleted {count} medications."},
             status=status.HTTP_204_NO_CONTENT
 )
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """Stream an NDJSON or CSV upload ('file') into medications for the authenticated user."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "An NDJSON or CSV file is required."}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or format_for(upload.name)
+        if file_format not in FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        report = import_medications(request.user, upload, file_format, request.data.get('start_time'))
+        logger.info(f"Imported {report.created} medications ({report.rows_per_second:.0f} rows/s)")
+        return Response(report.as_dict(), status=status.HTTP_201_CREATED if report.created else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='running-out')
+    def running_out(self, request):
+        """Active medications forecast to run out within ?within= (default 7d), soonest first."""
+        try:
+            horizon = parse_horizon(request.query_params.get('within'), default=timedelta(days=7))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        medications = self.get_queryset().running_out(timezone.now() + horizon)
+        return Response(MedicationSerializer(medications, many=True).data)
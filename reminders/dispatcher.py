@@ -0,0 +1,228 @@
+"""In-process reminder dispatcher built on a hierarchical timing wheel
+
+Instead of polling the whole schedule table (or queueing one Celery ETA task
+per dose), the dispatcher loads the doses due in the next lookahead window
+into a timing wheel and fires them as the wheel turns. The database is only
+asked for one small time range per refill.
+"""
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+from schedules.models import Schedule, ScheduleRule, rules_due, unrecorded_occurrences
+from .utils import DueDose, coalesce_doses, send_dose_reminders
+
+logger = logging.getLogger(__name__)
+
+
+def upcoming_doses(start, end):
+    """Pending doses due in [start, end)."""
+    return Schedule.objects.filter(status='scheduled', next_dose_due_at__gte=start, next_dose_due_at__lt=end)
+
+
+def upcoming_rule_doses(start, end):
+    """DueDose tuples for the unrecorded schedule rule occurrences due in [start, end).
+
+    Virtual doses have no row, so their key is ('rule', medication id, due time).
+    """
+    rules = rules_due(end).select_related('medication')
+    return [
+        DueDose(('rule', rule.medication_id, due_at), rule.medication.user_id, due_at,
+                rule.medication.priority_flag, rule.medication.priority_lead_time)
+        for rule, due_at in unrecorded_occurrences(rules, start, end)
+        if due_at < end
+    ]
+
+
+def pending_rule_doses(keys):
+    """{key: unsaved Schedule} for the virtual doses in `keys` that are still unrecorded."""
+    if not keys:
+        return {}
+    rules = {
+        rule.medication_id: rule
+        for rule in ScheduleRule.objects.select_related('medication__user').filter(
+            medication_id__in={medication_id for _, medication_id, _ in keys}, medication__status='active'
+        )
+    }
+    recorded = set(
+        Schedule.objects.filter(
+            medication_id__in=rules, next_dose_due_at__in={due_at for _, _, due_at in keys}
+        ).values_list('medication_id', 'next_dose_due_at')
+    )
+    pending = {}
+    for key in keys:
+        _, medication_id, due_at = key
+        rule = rules.get(medication_id)
+        if rule is not None and (medication_id, due_at) not in recorded and rule.is_occurrence(due_at):
+            pending[key] = Schedule(medication=rule.medication, next_dose_due_at=due_at)
+    return pending
+
+
+class TimingWheel:
+    """Hierarchical timing wheel with O(1) insert and amortized O(1) expiry.
+
+    Level 0 has one slot per tick, and every higher level has one slot per full
+    turn of the level below it. Entries are kept in the lowest level whose range
+    covers them and cascade down a level each time the lower level wraps.
+    Entries beyond the top level wait in an overflow list.
+    """
+
+    def __init__(self, tick=0.5, slots=(120, 60, 24), now=None):
+        self.tick = tick
+        self.slots = slots
+        # number of ticks covered by a single slot of each level
+        self.spans = [1]
+        for size in slots[:-1]:
+            self.spans.append(self.spans[-1] * size)
+        self.capacity = self.spans[-1] * slots[-1]
+        self.levels = [[[] for _ in range(size)] for size in slots]
+        self.overflow = []
+        self.expired = []
+        self.current = math.floor((time.time() if now is None else now) / tick)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, item, when):
+        """Schedule item to expire at the first tick at or after `when` (epoch seconds)."""
+        self.size += 1
+        self._place(math.ceil(when / self.tick), item)
+
+    def _place(self, due_tick, item):
+        delta = due_tick - self.current
+        if delta <= 0:
+            self.expired.append(item)
+            return
+        for level, span in enumerate(self.spans):
+            if delta < span * self.slots[level]:
+                self.levels[level][(due_tick // span) % self.slots[level]].append((due_tick, item))
+                return
+        self.overflow.append((due_tick, item))
+
+    def _cascade(self, entries):
+        for due_tick, item in entries:
+            self._place(due_tick, item)
+
+    def advance(self, now):
+        """Turn the wheel up to `now` (epoch seconds) and return the expired items."""
+        target = math.floor(now / self.tick)
+        while self.current < target:
+            self.current += 1
+            if self.current % self.capacity == 0:
+                overflow, self.overflow = self.overflow, []
+                self._cascade(overflow)
+            # higher levels first, so entries can fall through several levels in one tick
+            for level in range(len(self.slots) - 1, 0, -1):
+                span = self.spans[level]
+                if self.current % span == 0:
+                    slot = self.levels[level][(self.current // span) % self.slots[level]]
+                    entries = slot[:]
+                    slot.clear()
+                    self._cascade(entries)
+            bucket = self.levels[0][self.current % self.slots[0]]
+            self.expired.extend(item for _, item in bucket)
+            bucket.clear()
+
+        expired, self.expired = self.expired, []
+        self.size -= len(expired)
+        return expired
+
+
+class ReminderDispatcher:
+    """Fires reminders for scheduled doses as they come due.
+
+    Every `lookahead / 2` the dispatcher loads the `scheduled` doses due before
+    `now + lookahead + coalesce_window` into the wheel. The first load also
+    picks up doses that became due within the last `catch_up`. Each user's newly
+    loaded doses are coalesced into batches (see coalesce_doses), joining the
+    user's batch that is still waiting on the wheel when they fit, and every
+    batch is one entry on the wheel and one notification. Loading one window
+    ahead means a dose is always on the wheel before the batch it belongs
+    with fires, wherever the refills fall. Occurrences of schedule rules are loaded
+    the same way, without a row. Before a reminder is sent, the doses are
+    checked again so that doses taken or missed in the meantime are skipped.
+    """
+
+    def __init__(self, lookahead=timedelta(minutes=10), catch_up=timedelta(hours=1),
+                 tick=0.5, notify=send_dose_reminders, clock=time.time, coalesce_window=None):
+        self.lookahead = lookahead
+        self.catch_up = catch_up
+        if coalesce_window is None:
+            coalesce_window = timedelta(minutes=settings.REMINDER_COALESCE_MINUTES)
+        self.coalesce_window = coalesce_window
+        self.notify = notify
+        self.clock = clock
+        self.wheel = TimingWheel(tick=tick, now=clock())
+        self.loaded = {}  # schedule id -> due time, for doses on the wheel or already fired
+        self.open_batches = {}  # user id -> the user's latest batch still on the wheel
+        self.loaded_from = None
+        self.next_refill = None
+
+    def refill(self, now):
+        """Load the doses due in the next lookahead window that are not on the wheel yet."""
+        now_dt = datetime.fromtimestamp(now, tz=dt_timezone.utc)
+        window_start = self.loaded_from or now_dt - self.catch_up
+        window_end = now_dt + self.lookahead + self.coalesce_window
+
+        # forget doses that can no longer come back from the window query
+        self.loaded = {pk: due for pk, due in self.loaded.items() if due >= window_start}
+
+        upcoming = upcoming_doses(window_start, window_end).values_list(
+            'pk', 'medication__user_id', 'next_dose_due_at',
+            'medication__priority_flag', 'medication__priority_lead_time',
+        )
+        new_doses = [
+            dose for dose in [*map(DueDose._make, upcoming), *upcoming_rule_doses(window_start, window_end)]
+            if dose.schedule_id not in self.loaded
+        ]
+        for dose in new_doses:
+            self.loaded[dose.schedule_id] = dose.due_at
+        batches = coalesce_doses(new_doses, self.coalesce_window, self.open_batches)
+        for batch in batches:
+            self.wheel.insert(batch, batch.notify_at.timestamp())
+
+        self.loaded_from = now_dt
+        self.next_refill = now + self.lookahead.total_seconds() / 2
+        logger.debug("Loaded %s doses in %s batches due before %s", len(new_doses), len(batches), window_end)
+        return len(new_doses)
+
+    def dispatch(self, now):
+        """Send one reminder per batch that expired on the wheel up to `now`."""
+        batches = self.wheel.advance(now)
+        if not batches:
+            return []
+        for batch in batches:
+            if self.open_batches.get(batch.user_id) is batch:
+                del self.open_batches[batch.user_id]
+        batches = [[dose.schedule_id for dose in batch.doses] for batch in batches]
+        keys = [key for batch in batches for key in batch]
+        pending = Schedule.objects.select_related('medication__user').filter(
+            pk__in=[key for key in keys if not isinstance(key, tuple)], status='scheduled'
+        ).in_bulk()
+        pending.update(pending_rule_doses([key for key in keys if isinstance(key, tuple)]))
+        sent = []
+        for batch in batches:
+            schedules = [pending[pk] for pk in batch if pk in pending]
+            if not schedules:
+                continue
+            try:
+                self.notify(schedules)
+            except Exception:  # keep the dispatcher alive, the next batch must still go out
+                logger.exception("Failed to send reminders for %s doses", len(schedules))
+            sent.extend(schedules)
+        return sent
+
+    def run_once(self):
+        now = self.clock()
+        if self.next_refill is None or now >= self.next_refill:
+            self.refill(now)
+        return self.dispatch(now)
+
+    def run_forever(self):
+        while True:
+            self.run_once()
+            time.sleep(self.wheel.tick)
@@ -0,0 +1,30 @@
+"""Run the long-lived reminder dispatcher"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from reminders.dispatcher import ReminderDispatcher
+
+
+class Command(BaseCommand):
+    help = "Dispatch medication reminders as doses come due, using an in-process timing wheel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookahead', type=int, default=600,
+                            help="Seconds of upcoming doses to keep loaded (default: 600).")
+        parser.add_argument('--catch-up', type=int, default=3600,
+                            help="On start, also remind doses that became due this many seconds ago (default: 3600).")
+        parser.add_argument('--tick', type=float, default=0.5,
+                            help="Wheel resolution in seconds (default: 0.5).")
+
+    def handle(self, *args, **options):
+        dispatcher = ReminderDispatcher(
+            lookahead=timedelta(seconds=options['lookahead']),
+            catch_up=timedelta(seconds=options['catch_up']),
+            tick=options['tick'],
+        )
+        self.stdout.write(self.style.SUCCESS("Reminder dispatcher started."))
+        try:
+            dispatcher.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Reminder dispatcher stopped.")
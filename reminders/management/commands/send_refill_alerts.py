@@ -0,0 +1,21 @@
+"""Send refill alerts for medications about to run out"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reminders.utils import send_refill_alerts
+
+
+class Command(BaseCommand):
+    help = ("Email users whose medications are forecast to run out within the lead window. "
+            "Meant to run periodically (e.g. hourly from cron); each forecast is alerted once.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-days', type=int, default=settings.REFILL_ALERT_LEAD_DAYS,
+                            help="Alert medications running out within this many days "
+                                 f"(default: {settings.REFILL_ALERT_LEAD_DAYS}).")
+
+    def handle(self, *args, **options):
+        alerted = send_refill_alerts(timedelta(days=options['lead_days']))
+        self.stdout.write(self.style.SUCCESS(f"Sent refill alerts for {alerted} medications."))
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from django.test import SimpleTestCase
+from reminders.utils import DueDose, coalesce_doses
+
+START = datetime(2024, 10, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def dose(schedule_id, minutes, user_id=1, priority_lead_time=None):
+    return DueDose(schedule_id, user_id, START + timedelta(minutes=minutes), bool(priority_lead_time), priority_lead_time)
+
+
+def batch_ids(batches):
+    return [[d.schedule_id for d in batch.doses] for batch in batches]
+
+
+class CoalesceDosesTest(SimpleTestCase):
+    def test_groups_doses_within_the_window_per_user(self):
+        batches = coalesce_doses(
+            [dose(1, 0), dose(2, 4), dose(3, 9), dose(4, 12), dose(5, 2, user_id=2)],
+            timedelta(minutes=10),
+        )
+        self.assertEqual(batch_ids(batches), [[1, 2, 3], [5], [4]])
+        self.assertEqual(batches[0].notify_at, START)
+
+    def test_priority_doses_are_never_moved(self):
+        batches = coalesce_doses([dose(1, 0), dose(2, 5, priority_lead_time=30)], timedelta(minutes=10))
+
+        self.assertEqual(batch_ids(batches), [[1], [2]])
+        self.assertEqual(batches[1].notify_at, START + timedelta(minutes=5))
+
+    def test_lead_time_after_priority_dose_is_respected(self):
+        # initial_schedule puts every other drug priority_lead_time after the priority drug
+        batches = coalesce_doses(
+            [dose(1, 0, priority_lead_time=20), dose(2, 20), dose(3, 20)],
+            timedelta(minutes=30),
+        )
+        self.assertEqual(batch_ids(batches), [[1], [2, 3]])
+
+    def test_later_doses_never_join_a_priority_batch(self):
+        batches = coalesce_doses(
+            [dose(1, 0, priority_lead_time=20), dose(4, 5), dose(5, 0)],
+            timedelta(minutes=30),
+        )
+        self.assertEqual(batch_ids(batches), [[1, 5], [4]])
+
+    def test_doses_join_a_batch_that_is_not_notified_yet(self):
+        first = coalesce_doses([dose(1, 0)], timedelta(minutes=10))
+        open_batches = {1: first[0]}
+
+        batches = coalesce_doses([dose(2, 4), dose(3, 15)], timedelta(minutes=10), open_batches)
+
+        self.assertEqual(batch_ids(first + batches), [[1, 2], [3]])
+        self.assertEqual(open_batches[1], batches[0])
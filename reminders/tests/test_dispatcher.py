@@ -0,0 +1,130 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from medications.models import Medication
+from reminders.dispatcher import ReminderDispatcher, TimingWheel
+from schedules.models import Schedule
+from users.models import User
+
+
+class TimingWheelTest(TestCase):
+    def test_items_expire_on_their_tick(self):
+        wheel = TimingWheel(tick=1, slots=(10, 10, 10), now=0)
+        wheel.insert('a', 3)
+        wheel.insert('b', 2.5)  # rounds up, never fires early
+
+        self.assertEqual(wheel.advance(2), [])
+        self.assertEqual(sorted(wheel.advance(3)), ['a', 'b'])
+        self.assertEqual(len(wheel), 0)
+
+    def test_items_cascade_through_levels_and_overflow(self):
+        wheel = TimingWheel(tick=1, slots=(10, 10, 10), now=0)
+        due = {'level0': 7, 'level1': 55, 'level2': 734, 'overflow': 2345}
+        for item, when in due.items():
+            wheel.insert(item, when)
+
+        fired = {}
+        for now in range(1, 2400):
+            for item in wheel.advance(now):
+                fired[item] = now
+
+        self.assertEqual(fired, due)
+
+    def test_past_items_expire_immediately(self):
+        wheel = TimingWheel(tick=1, now=100)
+        wheel.insert('late', 50)
+        self.assertEqual(wheel.advance(100), ['late'])
+
+
+class ReminderDispatcherTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email='dispatch@example.com',
+            first_name='Dis',
+            last_name='Patch',
+            password='securepassword123',
+            is_verified=True
+        )
+        self.medication = Medication.objects.create(
+            user=user, drug_name='Drug A', total_quantity=10, dosage_per_intake=1, time_interval=8
+        )
+        self.start = timezone.now()
+        self.now = self.start.timestamp()
+        self.sent = []
+        self.dispatcher = ReminderDispatcher(
+            lookahead=timedelta(minutes=10),
+            notify=self.sent.extend,
+            clock=lambda: self.now,
+            coalesce_window=timedelta(0),
+        )
+
+    def schedule_in(self, **offset):
+        return Schedule.objects.create(medication=self.medication, next_dose_due_at=self.start + timedelta(**offset))
+
+    def run_until(self, **offset):
+        end = (self.start + timedelta(**offset)).timestamp()
+        while self.now < end:
+            self.now += 0.5
+            self.dispatcher.run_once()
+
+    def test_fires_each_due_dose_once(self):
+        soon = self.schedule_in(seconds=30)
+        later = self.schedule_in(minutes=8)
+        self.schedule_in(hours=2)
+
+        self.run_until(minutes=1)
+        self.assertEqual(self.sent, [soon])
+
+        self.run_until(minutes=20)
+        self.assertEqual(self.sent, [soon, later])
+
+    def test_doses_created_after_start_are_picked_up_by_refill(self):
+        self.run_until(minutes=1)
+        dose = self.schedule_in(minutes=9)
+
+        self.run_until(minutes=10)
+
+        self.assertEqual(self.sent, [dose])
+
+    def test_resolved_doses_are_not_reminded(self):
+        dose = self.schedule_in(seconds=30)
+        self.run_until(seconds=10)
+        Schedule.objects.filter(pk=dose.pk).update(status='fulfilled')
+
+        self.run_until(minutes=1)
+
+        self.assertEqual(self.sent, [])
+
+    def test_co_due_doses_share_one_notification(self):
+        self.dispatcher.coalesce_window = timedelta(minutes=10)
+        notifications = []
+        self.dispatcher.notify = notifications.append
+        first = self.schedule_in(seconds=30)
+        second = self.schedule_in(minutes=5)
+
+        self.run_until(seconds=31)
+
+        self.assertEqual(notifications, [[first, second]])
+
+    def test_doses_on_either_side_of_a_refill_share_one_notification(self):
+        self.dispatcher.coalesce_window = timedelta(minutes=10)
+        notifications = []
+        self.dispatcher.notify = notifications.append
+        first = self.schedule_in(minutes=9, seconds=30)
+        second = self.schedule_in(minutes=13)
+
+        self.run_until(minutes=15)
+
+        self.assertEqual(notifications, [[first, second]])
+
+    def test_dose_loaded_by_a_later_refill_joins_the_waiting_batch(self):
+        self.dispatcher.coalesce_window = timedelta(minutes=10)
+        notifications = []
+        self.dispatcher.notify = notifications.append
+        first = self.schedule_in(minutes=9)
+        self.run_until(minutes=1)
+        second = self.schedule_in(minutes=12)
+
+        self.run_until(minutes=15)
+
+        self.assertEqual(notifications, [[first, second]])
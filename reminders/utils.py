@@ -0,0 +1,129 @@
+"""Helpers for sending medication reminders"""
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+from medications.models import Medication
+from users.utils import send_normal_email, send_normal_email_now
+
+# a pending dose as seen by the dispatcher
+DueDose = namedtuple('DueDose', 'schedule_id user_id due_at priority_flag priority_lead_time')
+# doses of one user covered by a single notification sent at notify_at
+DoseBatch = namedtuple('DoseBatch', 'user_id notify_at doses')
+
+
+def _fits(batch, dose, tolerance):
+    """Check whether `dose` can be reminded together with the doses already in `batch`."""
+    gap = dose.due_at - batch.notify_at
+    # a dose is never reminded late, nor more than `tolerance` early
+    if gap < timedelta(0) or gap > tolerance:
+        return False
+    # priority doses are never reminded ahead of time
+    if dose.priority_flag and gap:
+        return False
+    # reminding a later dose with a priority dose would take away the lead time it must wait
+    if gap and any(d.priority_flag and d.priority_lead_time for d in batch.doses):
+        return False
+    return True
+
+
+def coalesce_doses(doses, tolerance, open_batches=None):
+    """Group each user's doses that fall within `tolerance` of each other.
+
+    A batch is notified at the due time of its earliest dose, so no dose is
+    reminded late. Later non-priority doses inside the window are reminded early,
+    while priority doses always open their own batch unless they share its time,
+    and a batch with a priority dose takes no later doses.
+
+    Args:
+        doses (iterable): DueDose tuples
+        tolerance (timedelta): how far ahead of its due time a dose may be reminded
+        open_batches (dict): optional {user_id: DoseBatch} of the latest batch of each
+            user that was not notified yet. Doses that fit join it (in place), and it
+            is replaced by the user's latest new batch.
+
+    Returns:
+        list: the new DoseBatch tuples, ordered by notify_at
+    """
+    by_user = defaultdict(list)
+    for dose in doses:
+        by_user[dose.user_id].append(dose)
+
+    batches = []
+    for user_id, user_doses in by_user.items():
+        user_doses.sort(key=lambda dose: (dose.due_at, not dose.priority_flag))
+        batch = open_batches.get(user_id) if open_batches is not None else None
+        for dose in user_doses:
+            if batch and _fits(batch, dose, tolerance):
+                batch.doses.append(dose)
+            else:
+                batch = DoseBatch(user_id, dose.due_at, [dose])
+                batches.append(batch)
+        if open_batches is not None:
+            open_batches[user_id] = batch
+    batches.sort(key=lambda batch: batch.notify_at)
+    return batches
+
+
+def send_dose_reminders(schedules):
+    """Email each user one reminder covering all of their due doses.
+
+    Args:
+        schedules (list): due Schedule objects with medication__user selected
+    """
+    by_user = defaultdict(list)
+    for schedule in schedules:
+        by_user[schedule.medication.user].append(schedule)
+
+    for user, user_schedules in by_user.items():
+        lines = "\n".join(
+            f"- {schedule.medication.dosage_per_intake} of {schedule.medication.drug_name} "
+            f"(due at {timezone.localtime(schedule.next_dose_due_at):%Y-%m-%d %H:%M})"
+            for schedule in sorted(user_schedules, key=lambda schedule: schedule.next_dose_due_at)
+        )
+        send_normal_email({
+            'email_subject': "Medication Reminder",
+            'email_body': f"Hi {user.first_name},\n\nIt is time to take:\n{lines}\n\nYour Health, On Time.",
+            'to_email': user.email,
+        })
+
+
+def send_refill_alerts(lead, now=None):
+    """Email each user one refill alert for their medications running out within `lead`.
+
+    Medications are found through the runs_out_at index and are alerted once
+    per forecast: refill_alerted_at is stamped with one UPDATE, and is only
+    cleared when the forecast moves later (see MedicationQuerySet.refresh_forecasts).
+    The emails are sent synchronously and only the medications whose email was
+    delivered are stamped, so a failed alert is sent again on the next run.
+
+    Returns:
+        int: the number of medications alerted
+    """
+    now = now or timezone.now()
+    medications = list(
+        Medication.objects.running_out(now + lead).filter(refill_alerted_at__isnull=True).select_related('user')
+    )
+    by_user = defaultdict(list)
+    for medication in medications:
+        by_user[medication.user].append(medication)
+
+    alerted = []
+    for user, user_medications in by_user.items():
+        lines = "\n".join(
+            f"- {medication.drug_name} ({medication.total_left} left, runs out "
+            f"{timezone.localtime(medication.runs_out_at):%Y-%m-%d %H:%M})"
+            for medication in user_medications
+        )
+        delivered = send_normal_email_now({
+            'email_subject': "Time to refill your medication",
+            'email_body': f"Hi {user.first_name},\n\nThese medications are running low:\n{lines}\n\n"
+                          "Your Health, On Time.",
+            'to_email': user.email,
+        })
+        if delivered:
+            alerted.extend(user_medications)
+
+    Medication.objects.filter(pk__in=[medication.pk for medication in alerted]).update(refill_alerted_at=now)
+    return len(alerted)
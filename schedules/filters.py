@@ -0,0 +1,73 @@
+"""Query parameter filters for the schedule list
+
+Every filter becomes a predicate one of the per-user Schedule indexes can
+answer: status goes to schedule_user_status_due_idx, and due times and
+medication to schedule_user_cursor_idx (already in page order), so the cost
+follows the user's rows and not the whole table.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import ADHERENCE_ROLLUPS, Schedule
+
+
+class ScheduleFilterSerializer(serializers.Serializer):
+    """Validates the filters accepted by GET /schedules/."""
+    status = serializers.MultipleChoiceField(choices=Schedule.STATUS_CHOICES, required=False)
+    medication = serializers.IntegerField(min_value=1, required=False)
+    due_after = serializers.DateTimeField(required=False)
+    due_before = serializers.DateTimeField(required=False)
+    # the next N pending doses from now, e.g. today's agenda
+    upcoming = serializers.IntegerField(min_value=1, max_value=500, required=False)
+
+    def to_internal_value(self, data):
+        # ?status=missed,fulfilled and ?status=missed&status=fulfilled are both accepted
+        if hasattr(data, 'getlist') and 'status' in data:
+            data = data.copy()
+            data.setlist('status', [value for item in data.getlist('status') for value in item.split(',') if value])
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if 'due_after' in attrs and 'due_before' in attrs and attrs['due_after'] >= attrs['due_before']:
+            raise serializers.ValidationError({'due_before': 'due_before must be later than due_after.'})
+        return attrs
+
+
+def filter_schedules(queryset, filters, now=None):
+    """Apply validated ScheduleFilterSerializer data to a Schedule queryset."""
+    if filters.get('upcoming'):
+        queryset = queryset.filter(status='scheduled', next_dose_due_at__gte=now or timezone.now())
+    if filters.get('status'):
+        queryset = queryset.filter(status__in=sorted(filters['status']))
+    if 'medication' in filters:
+        queryset = queryset.filter(medication_id=filters['medication'])
+    if 'due_after' in filters:
+        queryset = queryset.filter(next_dose_due_at__gte=filters['due_after'])
+    if 'due_before' in filters:
+        queryset = queryset.filter(next_dose_due_at__lt=filters['due_before'])
+    return queryset
+
+
+class AdherenceFilterSerializer(serializers.Serializer):
+    """Validates the parameters of GET /schedules/adherence/."""
+    period = serializers.ChoiceField(choices=list(ADHERENCE_ROLLUPS), default='day')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    medication = serializers.IntegerField(min_value=1, required=False)
+    # staff only: the patients of a cohort
+    user = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+
+    def to_internal_value(self, data):
+        if hasattr(data, 'getlist') and 'user' in data:
+            data = data.copy()
+            data.setlist('user', [value for item in data.getlist('user') for value in item.split(',') if value])
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        attrs.setdefault('end', timezone.localdate())
+        attrs.setdefault('start', attrs['end'] - timedelta(days=30))
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'end': 'end must not be before start.'})
+        return attrs
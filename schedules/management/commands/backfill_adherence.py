@@ -0,0 +1,92 @@
+"""Rebuild the adherence rollups from the schedule history"""
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from medications.models import Medication
+from schedules.models import ADHERENCE_ROLLUPS, ADHERENCE_STATUSES, Schedule
+
+RETRIES = 3
+
+
+class Command(BaseCommand):
+    help = ("Rebuild DailyAdherence and WeeklyAdherence from every fulfilled and missed Schedule row. "
+            "Medications are rebuilt a chunk at a time, each chunk in its own short transaction that "
+            "swaps its old rollup rows for the recounted ones. Each transaction holds the row locks of "
+            "its medications, which dose writes take as well, so a dose marked while it runs is counted "
+            "exactly once and the database stays writable between chunks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Medications rebuilt per transaction (default: 500).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunk_size = options['chunk_size']
+        medication_ids = Medication.objects.order_by('pk').values_list('pk', flat=True)
+        doses = rows = 0
+        last_id = 0
+        while chunk := list(medication_ids.filter(pk__gt=last_id)[:chunk_size]):
+            chunk_doses, chunk_rows = self.rebuild_chunk(chunk)
+            doses += chunk_doses
+            rows += chunk_rows
+            last_id = chunk[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {doses} doses into {rows} rows in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def rebuild_chunk(self, medication_ids):
+        """Swap the rollups of `medication_ids` for recounted ones; (doses, rows) written."""
+        for attempt in range(1, RETRIES + 1):
+            try:
+                with transaction.atomic():
+                    list(Medication.objects.select_for_update().filter(pk__in=medication_ids).values_list('pk'))
+                    # Deleting first makes SQLite take its write lock before reading, so a concurrent
+                    # writer waits for this chunk instead of deadlocking on a lock upgrade.
+                    for rollup in ADHERENCE_ROLLUPS.values():
+                        rollup.objects.filter(medication_id__in=medication_ids).delete()
+                    days = list(self.daily_counts(medication_ids))
+                    rows = 0
+                    for rollup in ADHERENCE_ROLLUPS.values():
+                        rows += len(rollup.objects.bulk_create(self.fold(rollup, days)))
+                return sum(fulfilled + missed for *_, fulfilled, missed in days), rows
+            except OperationalError as error:
+                if attempt == RETRIES:
+                    raise CommandError(
+                        f"Could not rebuild medications {medication_ids[0]}-{medication_ids[-1]}: {error}"
+                    ) from error
+
+    @staticmethod
+    def daily_counts(medication_ids):
+        """(user_id, medication_id, local day, fulfilled, missed) for every day with a recorded dose."""
+        local_day = TruncDate('next_dose_due_at', tzinfo=timezone.get_current_timezone())
+        return (
+            Schedule.objects.filter(medication_id__in=medication_ids, status__in=ADHERENCE_STATUSES).order_by()
+            .values('user_id', 'medication_id', day=local_day)
+            .annotate(
+                fulfilled=Count('pk', filter=Q(status='fulfilled')),
+                missed=Count('pk', filter=Q(status='missed')),
+            )
+            .values_list('user_id', 'medication_id', 'day', 'fulfilled', 'missed')
+        )
+
+    @staticmethod
+    def fold(rollup, days):
+        """New, unsaved `rollup` rows summing the daily counts over its periods."""
+        totals = defaultdict(lambda: [0, 0])
+        owners = {}
+        for user_id, medication_id, day, fulfilled, missed in days:
+            key = (medication_id, rollup.period_for(day))
+            totals[key][0] += fulfilled
+            totals[key][1] += missed
+            owners[key] = user_id
+        return [
+            rollup(user_id=owners[key], medication_id=key[0], period_start=key[1], fulfilled=fulfilled, missed=missed)
+            for key, (fulfilled, missed) in totals.items()
+        ]
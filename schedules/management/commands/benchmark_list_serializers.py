@@ -0,0 +1,73 @@
+"""Compare the list serializers with their .values() fast path"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from medications.models import Medication
+from medications.serializers import MedicationSerializer
+from schedules.models import Schedule
+from schedules.serializers import ScheduleSerializer
+from users.models import User
+from utility.fast_serializers import ValuesSerializer
+
+
+class Command(BaseCommand):
+    help = ("Measure rows per second of MedicationSerializer and ScheduleSerializer against the "
+            "ValuesSerializer fast path, checking that both render the same JSON. The sample rows "
+            "are created in a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help="List sizes to measure (default: 1000 10000 100000).")
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'list':<12}{'rows':>8}{'serializer rows/s':>20}{'values rows/s':>16}{'speedup':>9}")
+        for rows in options['rows']:
+            with transaction.atomic():
+                user = self.sample_user(rows)
+                for name, serializer_class, queryset in (
+                    ('medications', MedicationSerializer, Medication.objects.filter(user=user)),
+                    ('schedules', ScheduleSerializer,
+                     Schedule.objects.select_related('medication').filter(medication__user=user)),
+                ):
+                    fast = ValuesSerializer(serializer_class)
+                    # warm both paths up so the first size is not charged for imports and caches
+                    renderer.render(serializer_class(queryset[:100], many=True).data)
+                    renderer.render(fast.to_representation(fast.values(queryset)[:100]))
+                    slow_body, slow_seconds = self.timed(
+                        lambda: renderer.render(serializer_class(queryset, many=True).data))
+                    fast_body, fast_seconds = self.timed(
+                        lambda: renderer.render(fast.to_representation(fast.values(queryset))))
+                    if slow_body != fast_body:
+                        raise CommandError(f"The {name} fast path rendered different JSON.")
+                    self.stdout.write(
+                        f"{name:<12}{rows:>8}{rows / slow_seconds:>20,.0f}{rows / fast_seconds:>16,.0f}"
+                        f"{slow_seconds / fast_seconds:>8.1f}x"
+                    )
+                transaction.set_rollback(True)
+
+    def sample_user(self, rows):
+        user = User.objects.create_user(
+            email='benchmark@example.com', first_name='Bench', last_name='Mark', password='benchmark-password'
+        )
+        medications = Medication.objects.bulk_create(
+            Medication(user=user, drug_name=f'Drug {index}', total_quantity=60, total_left=60,
+                       dosage_per_intake=1, time_interval=8)
+            for index in range(rows)
+        )
+        start = timezone.now()
+        Schedule.objects.bulk_create(
+            Schedule(medication=medications[index % len(medications)], next_dose_due_at=start + timedelta(hours=index))
+            for index in range(rows)
+        )
+        return user
+
+    def timed(self, work):
+        started = time.perf_counter()
+        result = work()
+        return result, time.perf_counter() - started
@@ -0,0 +1,38 @@
+"""Export medication, schedule and missed dose history"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import User
+from utility.exporter import CHUNK_SIZE, FORMATS, export_lines, history
+
+
+class Command(BaseCommand):
+    help = ("Stream the medication, schedule and missed dose history of some or all users "
+            "as NDJSON or CSV, reading rows in chunks so memory use stays flat.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='emails', default=[],
+                            help="Email of a user to export; repeat for several (default: every user).")
+        parser.add_argument('--format', choices=FORMATS, default='ndjson', dest='file_format',
+                            help="Output format (default: ndjson).")
+        parser.add_argument('--output', help="File to write (default: standard output).")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f"Rows fetched from the database at a time (default: {CHUNK_SIZE}).")
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['emails']:
+            users = dict(User.objects.filter(email__in=options['emails']).values_list('email', 'pk'))
+            missing = sorted(set(options['emails']) - set(users))
+            if missing:
+                raise CommandError(f"No user with email {', '.join(missing)}")
+            user_ids = list(users.values())
+
+        lines = export_lines(history(user_ids, chunk_size=options['chunk_size']), options['file_format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            # write straight to stdout, without the per-line newline handling of self.stdout
+            sys.stdout.writelines(lines)
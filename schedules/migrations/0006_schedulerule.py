@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0010_remove_medication_last_scheduled_time'),
+        ('schedules', '0005_rename_scheduled_time_schedule_next_dose_due_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anchor', models.DateTimeField()),
+                ('interval', models.DurationField()),
+                ('count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_rule', to='medications.medication')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0010_remove_medication_last_scheduled_time'),
+        ('schedules', '0006_schedulerule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['medication', 'next_dose_due_at'], name='schedule_medication_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['next_dose_due_at'], name='schedule_pending_due_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:11
+
+import math
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_at_next_dose(apps, schema_editor):
+    """Existing rules start sweeping at their next dose, so deploying does not miss their whole past."""
+    ScheduleRule = apps.get_model('schedules', 'ScheduleRule')
+    now = timezone.now()
+    for rule in ScheduleRule.objects.all():
+        index = max(0, math.ceil((now - rule.anchor) / rule.interval))
+        rule.next_due_at = rule.anchor + index * rule.interval if index < rule.count else None
+        rule.save(update_fields=['next_due_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0011_medication_runs_out'),
+        ('schedules', '0008_adherence_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulerule',
+            name='next_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='schedulerule',
+            index=models.Index(fields=['next_due_at'], name='schedule_rule_next_due_idx'),
+        ),
+        migrations.RunPython(start_at_next_dose, migrations.RunPython.noop),
+    ]
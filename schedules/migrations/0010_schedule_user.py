@@ -0,0 +1,45 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_owner(apps, schema_editor):
+    Schedule = apps.get_model('schedules', 'Schedule')
+    Medication = apps.get_model('medications', 'Medication')
+    Schedule.objects.update(
+        user_id=Subquery(Medication.objects.filter(pk=OuterRef('medication_id')).values('user_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0011_medication_runs_out'),
+        ('schedules', '0009_schedule_rule_next_due'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='schedules', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='schedule',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='schedules', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['user', 'status', 'next_dose_due_at'], name='schedule_user_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['user', 'next_dose_due_at', 'id'], name='schedule_user_cursor_idx'),
+        ),
+    ]
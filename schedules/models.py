@@ -1,6 +1,23 @@
-from django.db import models
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from medications.models import Medication
+from users.models import User
+
+class ScheduleQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill in the owner of every schedule, as save() does, before inserting them."""
+        objs = list(objs)
+        for schedule in objs:
+            if schedule.user_id is None:
+                schedule.user_id = schedule.medication.user_id
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class Schedule(models.Model):
     STATUS_CHOICES = [
@@ -12,6 +29,8 @@ class Schedule(models.Model):
     ]
 
     medication = models.ForeignKey(Medication, on_delete=models.CASCADE)
+    # Owner of the medication, copied here so per-user lists read one index without a join
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedules', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     next_dose_due_at = models.DateTimeField()  # Time for next dose
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='scheduled')
@@ -21,28 +40,87 @@ class Schedule(models.Model):
     deleted_time = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # latest dose per medication (scheduler, timeline)
+            models.Index(fields=['medication', 'next_dose_due_at'], name='schedule_medication_due_idx'),
+            # due sweeps only ever look at pending doses
+            models.Index(
+                fields=['next_dose_due_at'],
+                condition=models.Q(status='scheduled'),
+                name='schedule_pending_due_idx',
+            ),
+            # ?status= and ?upcoming= filters on a user's schedule list
+            models.Index(fields=['user', 'status', 'next_dose_due_at'], name='schedule_user_status_due_idx'),
+            # keyset pagination of a user's schedule list (ScheduleCursorPagination)
+            models.Index(fields=['user', 'next_dose_due_at', 'id'], name='schedule_user_cursor_idx'),
+        ]
+
+    objects = ScheduleQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.medication.user_id
+        super().save(*args, **kwargs)
+
+    def _record_status(self, status, **times):
+        """Save a new status and its rollup events under the medication's row lock.
+
+        Callers run this inside a transaction. backfill_adherence holds the same
+        lock while it rebuilds the medication's rollups, so an event lands
+        either in the rows it counts or on top of the rows it swaps in.
+        """
+        list(Medication.objects.select_for_update().filter(pk=self.medication_id).values_list('pk'))
+        previous_status = self.status
+        self.status = status
+        for field, value in times.items():
+            setattr(self, field, value)
+        self.save()
+        record_adherence(self.adherence_events(previous_status))
+
     def mark_as_fulfilled(self):
         """Mark a scheduled as fulfilled and update med qty"""
-        self.status = 'fulfilled'
-        self.fulfilled_time = timezone.now()
-        self.save()
-        # update medication
-        self.medication.update_quantity(dose_taken=True)
+        with transaction.atomic():
+            self._record_status('fulfilled', fulfilled_time=timezone.now())
+            # update medication
+            self.medication.update_quantity(dose_taken=True)
 
     def mark_as_missed(self):
         """mark the schedule as missed and update med qty"""
-        self.status = 'missed'
-        self.missed_time = timezone.now()
-        self.save()
-        # update the missed dose in the MissedDose model
-        # Create a MissedDose record
-        missed_dose = MissedDose.objects.create(
-            medication=self.medication,
-            schedule=self,
-        )
-        # adjust missed dose quantity
-        missed_dose.adjust_medication_quantity()
+        with transaction.atomic():
+            self._record_status('missed', missed_time=timezone.now())
+            # update the missed dose in the MissedDose model
+            # Create a MissedDose record
+            missed_dose = MissedDose.objects.create(
+                medication=self.medication,
+                schedule=self,
+            )
+            # adjust missed dose quantity
+            missed_dose.adjust_medication_quantity()
 
+    def change_status(self, status):
+        """Move the dose to `status` with the stock, adherence and forecast updates that go with it."""
+        if status == 'fulfilled':
+            self.mark_as_fulfilled()
+        elif status == 'missed':
+            self.mark_as_missed()
+        else:
+            with transaction.atomic():
+                self._record_status(status, stopped_time=timezone.now() if status == 'stopped' else None)
+                # a dose leaving or rejoining 'scheduled' moves the forecast's next pending dose
+                Medication.objects.filter(pk=self.medication_id).refresh_forecasts()
+
+    def adherence_events(self, previous_status):
+        """Rollup events for a change from previous_status to the current status (none when it did not change)."""
+        if previous_status == self.status:
+            return []
+        user_id = self.medication.user_id
+        events = []
+        if self.status in ADHERENCE_STATUSES:
+            events.append((user_id, self.medication_id, self.next_dose_due_at, self.status, 1))
+        if previous_status in ADHERENCE_STATUSES:
+            events.append((user_id, self.medication_id, self.next_dose_due_at, previous_status, -1))
+        return events
 
     def is_due(self):
         """Check if this schedule is due."""
@@ -63,3 +141,215 @@ class MissedDose(models.Model):
 
         """Automatically reduce medication quantity when a dose is missed."""
         self.medication.update_quantity(dose_taken=False)
+
+
+class ScheduleRule(models.Model):
+    """Compact recurrence for a medication whose future doses are not stored as rows.
+
+    Occurrence i is due at anchor + i * interval for i in range(count). Only doses
+    that have an event (fulfilled, missed, stopped) are written as Schedule rows,
+    and those occurrences are skipped when the rule is expanded. The reminder
+    dispatcher reads the occurrences directly, and the missed dose sweep stores
+    the overdue ones as rows, from next_due_at on.
+    """
+    medication = models.OneToOneField(Medication, on_delete=models.CASCADE, related_name='schedule_rule')
+    anchor = models.DateTimeField()  # Time of the first dose
+    interval = models.DurationField()  # Gap between doses
+    count = models.PositiveIntegerField()  # Number of doses covered by the stock
+    next_due_at = models.DateTimeField(null=True, blank=True)  # First occurrence not swept yet, None when done
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # missed dose sweep and reminder dispatcher
+            models.Index(fields=['next_due_at'], name='schedule_rule_next_due_idx'),
+        ]
+
+    @classmethod
+    def for_medication(cls, medication, anchor):
+        """Build (without saving) the rule that matches a medication's regimen."""
+        count = medication.total_left // medication.dosage_per_intake
+        return cls(
+            medication=medication,
+            anchor=anchor,
+            interval=medication.dose_interval(),
+            count=count,
+            next_due_at=anchor if count else None,
+        )
+
+    def occurrences(self, start=None, end=None):
+        """Lazily yield the due times that fall inside [start, end]."""
+        first = 0 if start is None else max(0, math.ceil((start - self.anchor) / self.interval))
+        last = self.count - 1
+        if end is not None:
+            last = min(last, math.floor((end - self.anchor) / self.interval))
+        for index in range(first, last + 1):
+            yield self.anchor + index * self.interval
+
+    def occurrence_after(self, moment):
+        """The first due time strictly after `moment`, or None when the rule has ended."""
+        index = max(0, math.floor((moment - self.anchor) / self.interval) + 1)
+        return self.anchor + index * self.interval if index < self.count else None
+
+    def is_occurrence(self, due_at):
+        offset = due_at - self.anchor
+        return offset % self.interval == timedelta(0) and 0 <= offset // self.interval < self.count
+
+    def sync_with_medication(self):
+        """Re-anchor the rule at its next unswept dose after the medication's regimen was edited.
+
+        The rule is left alone (and False returned) when its interval and the
+        doses it still covers already match the medication.
+        """
+        if self.next_due_at is None:
+            return False
+        start = self.next_due_at
+        interval = self.medication.dose_interval()
+        doses = self.medication.total_left // self.medication.dosage_per_intake
+        if interval is None:
+            return False
+        # occurrences from start that already have a row were paid for when they were recorded
+        recorded = Schedule.objects.filter(medication_id=self.medication_id, next_dose_due_at__gte=start).count()
+        remaining = sum(1 for _ in self.occurrences(start))
+        if interval == self.interval and remaining == doses + recorded:
+            return False
+        self.anchor = start
+        if interval != self.interval:
+            recorded = 0  # the recorded rows are off the new grid
+        self.interval = interval
+        self.count = doses + recorded
+        self.next_due_at = start if self.count else None
+        self.save()
+        return True
+
+    def record(self, due_at, status):
+        """Store an event for one occurrence as a real Schedule row."""
+        schedule = Schedule.objects.create(medication=self.medication, next_dose_due_at=due_at)
+        schedule.change_status(status)
+        return schedule
+
+    def __str__(self):
+        return f'Every {self.interval} from {self.anchor} for {self.medication.drug_name} ({self.count} doses)'
+
+
+def rules_due(cutoff):
+    """Active schedule rules with an occurrence due at or before `cutoff` that is not swept yet."""
+    # a correlated pk lookup keeps the planner on schedule_rule_next_due_idx; a join lets it walk
+    # every active medication through the partial runs-out index instead
+    active = Medication.objects.filter(pk=OuterRef('medication_id'), status='active')
+    return ScheduleRule.objects.filter(Exists(active), next_due_at__lte=cutoff)
+
+
+def unrecorded_occurrences(rules, start, end):
+    """Yield (rule, due_at) for every occurrence in [start, end] that has no stored row yet."""
+    rules = list(rules)
+    if not rules:
+        return
+    recorded = set(
+        Schedule.objects.filter(
+            medication_id__in=[rule.medication_id for rule in rules],
+            next_dose_due_at__gte=start, next_dose_due_at__lte=end,
+        ).values_list('medication_id', 'next_dose_due_at')
+    )
+    for rule in rules:
+        for due_at in rule.occurrences(max(start, rule.next_due_at or start), end):
+            if (rule.medication_id, due_at) not in recorded:
+                yield rule, due_at
+
+
+ADHERENCE_STATUSES = ('fulfilled', 'missed')
+
+
+class AdherenceQuerySet(models.QuerySet):
+    def apply_events(self, events):
+        """Add rollup events to this table.
+
+        Args:
+            events (list): (user_id, medication_id, due_at, status, change) tuples, where
+                status is 'fulfilled' or 'missed' and change is +1 or -1
+
+        Costs one INSERT for missing periods, one SELECT and one UPDATE per
+        distinct (fulfilled, missed) delta, however many events there are.
+        """
+        deltas = defaultdict(lambda: [0, 0])
+        owners = {}
+        for user_id, medication_id, due_at, status, change in events:
+            key = (medication_id, self.model.period_for(timezone.localdate(due_at)))
+            deltas[key][ADHERENCE_STATUSES.index(status)] += change
+            owners[key] = user_id
+        deltas = {key: tuple(delta) for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            self.bulk_create(
+                [self.model(user_id=owners[key], medication_id=key[0], period_start=key[1]) for key in deltas],
+                ignore_conflicts=True,
+            )
+            rows_by_delta = defaultdict(list)
+            rows = self.filter(
+                medication_id__in={medication_id for medication_id, _ in deltas},
+                period_start__in={period_start for _, period_start in deltas},
+            ).values_list('pk', 'medication_id', 'period_start')
+            for pk, medication_id, period_start in rows:
+                if (medication_id, period_start) in deltas:
+                    rows_by_delta[deltas[medication_id, period_start]].append(pk)
+            for (fulfilled, missed), pks in rows_by_delta.items():
+                self.filter(pk__in=pks).update(
+                    fulfilled=Greatest(F('fulfilled') + fulfilled, 0),
+                    missed=Greatest(F('missed') + missed, 0),
+                )
+
+
+class AdherenceRollup(models.Model):
+    """Fulfilled and missed dose counts of one medication over one period.
+
+    Doses are bucketed by the local date (settings.TIME_ZONE) they were due.
+    Subclasses set `period_days` to 1 or 7; weekly periods start on Monday.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)  # denormalized for cohort queries
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE)
+    period_start = models.DateField()
+    fulfilled = models.PositiveIntegerField(default=0)
+    missed = models.PositiveIntegerField(default=0)
+
+    objects = AdherenceQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def period_for(cls, day):
+        """The first day of the period containing `day`."""
+        return day - timedelta(days=day.weekday() % cls.period_days)
+
+
+class DailyAdherence(AdherenceRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medication', 'period_start'], name='daily_adherence_unique'),
+        ]
+        indexes = [models.Index(fields=['user', 'period_start'], name='daily_adherence_user_idx')]
+
+    period_days = 1
+
+
+class WeeklyAdherence(AdherenceRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medication', 'period_start'], name='weekly_adherence_unique'),
+        ]
+        indexes = [models.Index(fields=['user', 'period_start'], name='weekly_adherence_user_idx')]
+
+    period_days = 7
+
+
+ADHERENCE_ROLLUPS = {'day': DailyAdherence, 'week': WeeklyAdherence}
+
+
+def record_adherence(events):
+    """Apply (user_id, medication_id, due_at, status, change) events to every rollup table."""
+    events = list(events)
+    for rollup in ADHERENCE_ROLLUPS.values():
+        rollup.objects.apply_events(events)
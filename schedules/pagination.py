@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ScheduleCursorPagination(CursorPagination):
+    """Keyset pagination over (next_dose_due_at, id).
+
+    Each page is a range read on schedule_user_cursor_idx (user,
+    next_dose_due_at, id) that starts where the previous page stopped, so deep
+    pages cost the same as the first one and no sort is needed. The id breaks
+    ties between doses due at the same time.
+    """
+    ordering = ('next_dose_due_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_page_size(self, request):
+        # ?upcoming=N asks for exactly the next N doses
+        upcoming = request.query_params.get('upcoming')
+        if upcoming and upcoming.isdigit():
+            return min(int(upcoming), self.max_page_size)
+        return super().get_page_size(request)
@@ -8,3 +8,18 @@ class ScheduleSerializer(serializers.ModelSerializer):
         model = Schedule
         fields = ['id', 'medication_name', 'created_at', 'next_dose_due_at', 'status']  # Only include the relevant fields
         read_only_fields = ['id', 'created_at', 'updated_at']  # Ensure fields are read-only where necessary
+
+    def update(self, instance, validated_data):
+        """Route a status change through Schedule.change_status, so stock, forecasts and adherence follow it."""
+        status = validated_data.pop('status', instance.status)
+        instance = super().update(instance, validated_data)
+        if status != instance.status:
+            instance.change_status(status)
+        return instance
+
+
+class RuleDoseSerializer(serializers.Serializer):
+    """An event for one occurrence of a schedule rule (POST /schedules/record/)."""
+    medication = serializers.IntegerField(min_value=1)
+    due_at = serializers.DateTimeField()
+    status = serializers.ChoiceField(choices=['fulfilled', 'missed', 'stopped'])
@@ -0,0 +1,37 @@
+"""Signal handlers for the schedule models"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from medications.models import Medication
+from utility.response_cache import bump_response_version
+from .models import MissedDose, Schedule, ScheduleRule
+
+
+def medication_owner(instance):
+    """User id behind instance.medication, without loading the medication when it isn't cached."""
+    if medication := instance._state.fields_cache.get('medication'):
+        return medication.user_id
+    return Medication.objects.filter(pk=instance.medication_id).values_list('user_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+@receiver([post_save, post_delete], sender=MissedDose)
+@receiver([post_save, post_delete], sender=ScheduleRule)
+def invalidate_cached_responses(sender, instance, **kwargs):
+    """Drop the owner's cached medication and schedule responses and agendas."""
+    user_id = medication_owner(instance)
+    if user_id is not None:  # the medication is gone, and its own post_delete bumped already
+        bump_response_version(user_id)
+
+
+@receiver(post_save, sender=Medication)
+def sync_schedule_rule(sender, instance, created, **kwargs):
+    """Keep a medication's schedule rule in step with an edited interval or dose size."""
+    if created:
+        return
+    rule = ScheduleRule.objects.filter(medication=instance).first()
+    if rule is None:
+        return
+    rule.medication = instance
+    if rule.sync_with_medication():
+        Medication.objects.filter(pk=instance.pk).refresh_forecasts()
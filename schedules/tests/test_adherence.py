@@ -0,0 +1,147 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import DailyAdherence, Schedule, WeeklyAdherence
+from users.models import User
+from utility.missed_dose_handler import handle_missed_doses
+
+
+class AdherenceRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='adherence@example.com', first_name='Ad', last_name='Here', password='securepassword123'
+        )
+        self.medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=100, dosage_per_intake=1, time_interval=8
+        )
+        # Wednesday 1 January 2025, 09:00 in Lagos (UTC+1)
+        self.morning = datetime(2025, 1, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+    def dose(self, due_at):
+        return Schedule.objects.create(medication=self.medication, next_dose_due_at=due_at)
+
+    def daily(self):
+        return list(DailyAdherence.objects.order_by('period_start').values_list('period_start', 'fulfilled', 'missed'))
+
+    def test_marking_doses_updates_daily_and_weekly_rollups(self):
+        self.dose(self.morning).mark_as_fulfilled()
+        self.dose(self.morning + timedelta(hours=8)).mark_as_missed()
+
+        self.assertEqual(self.daily(), [(date(2025, 1, 1), 1, 1)])
+        weekly = WeeklyAdherence.objects.get()
+        self.assertEqual((weekly.period_start, weekly.fulfilled, weekly.missed), (date(2024, 12, 30), 1, 1))
+
+    def test_doses_are_bucketed_by_local_date(self):
+        self.dose(datetime(2025, 1, 1, 23, 30, tzinfo=dt_timezone.utc)).mark_as_fulfilled()  # 00:30 in Lagos
+        self.assertEqual(self.daily(), [(date(2025, 1, 2), 1, 0)])
+
+    def test_missed_dose_taken_later_moves_between_counters(self):
+        schedule = self.dose(self.morning)
+        schedule.mark_as_missed()
+        schedule.mark_as_fulfilled()
+
+        self.assertEqual(self.daily(), [(date(2025, 1, 1), 1, 0)])
+
+    def test_marking_a_dose_again_with_the_same_status_counts_it_once(self):
+        schedule = self.dose(self.morning)
+        schedule.mark_as_fulfilled()
+        schedule.mark_as_fulfilled()
+
+        self.assertEqual(self.daily(), [(date(2025, 1, 1), 1, 0)])
+
+    def test_status_patch_updates_the_rollups(self):
+        schedule = self.dose(self.morning)
+        schedule.mark_as_missed()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        self.assertEqual(client.patch(f'/api/v1/schedules/{schedule.pk}/', {'status': 'fulfilled'}).status_code, 200)
+        self.assertEqual(self.daily(), [(date(2025, 1, 1), 1, 0)])
+        self.assertEqual(client.patch(f'/api/v1/schedules/{schedule.pk}/', {'status': 'stopped'}).status_code, 200)
+        self.assertEqual(self.daily(), [(date(2025, 1, 1), 0, 0)])
+
+    def test_sweeper_updates_the_rollups(self):
+        self.dose(timezone.now() - timedelta(hours=3))
+        self.dose(timezone.now() - timedelta(hours=2))
+
+        handle_missed_doses()
+
+        self.assertEqual(sum(missed for _, _, missed in self.daily()), 2)
+
+    def test_backfill_rebuilds_the_same_rollups(self):
+        for hours in range(0, 96, 8):
+            schedule = self.dose(self.morning + timedelta(hours=hours))
+            schedule.mark_as_fulfilled() if hours % 16 else schedule.mark_as_missed()
+        incremental = self.daily()
+
+        DailyAdherence.objects.update(fulfilled=99)  # drifted counts are replaced, not added to
+
+        call_command('backfill_adherence', chunk_size=5, stdout=StringIO())
+
+        self.assertEqual(self.daily(), incremental)
+        self.assertEqual(WeeklyAdherence.objects.get().fulfilled + WeeklyAdherence.objects.get().missed, 12)
+
+    def test_backfill_rebuilds_each_chunk_of_medications_in_its_own_transaction(self):
+        other = Medication.objects.create(
+            user=self.user, drug_name='Drug B', total_quantity=100, dosage_per_intake=1, time_interval=8
+        )
+        self.dose(self.morning).mark_as_fulfilled()
+        Schedule.objects.create(medication=other, next_dose_due_at=self.morning).mark_as_missed()
+        incremental = sorted(DailyAdherence.objects.values_list('medication_id', 'fulfilled', 'missed'))
+        DailyAdherence.objects.update(fulfilled=99)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('backfill_adherence', chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(sum(query['sql'].startswith('SAVEPOINT') for query in queries), 2)
+
+        self.assertEqual(sorted(DailyAdherence.objects.values_list('medication_id', 'fulfilled', 'missed')), incremental)
+
+
+class AdherenceEndpointTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='patient@example.com', first_name='Pa', last_name='Tient', password='securepassword123'
+        )
+        medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=100, dosage_per_intake=1, time_interval=8
+        )
+        today = timezone.localdate()
+        DailyAdherence.objects.create(
+            user=self.user, medication=medication, period_start=today, fulfilled=3, missed=1
+        )
+        DailyAdherence.objects.create(
+            user=self.user, medication=medication, period_start=today - timedelta(days=90), fulfilled=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_reads_only_the_rollups(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/schedules/adherence/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['fulfilled'], response.data['missed']), (3, 1))
+        self.assertEqual(response.data['adherence'], 0.75)
+        self.assertEqual(len(response.data['rows']), 1)
+
+    def test_cohorts_are_staff_only(self):
+        response = self.client.get('/api/v1/schedules/adherence/', {'user': self.user.pk})
+        self.assertEqual(response.status_code, 403)
+
+        staff = User.objects.create_user(
+            email='clinician@example.com', first_name='Cli', last_name='Nician', password='securepassword123',
+            is_staff=True,
+        )
+        self.client.force_authenticate(user=staff)
+        response = self.client.get('/api/v1/schedules/adherence/', {'user': f'{self.user.pk},{staff.pk}'})
+        self.assertEqual(response.data['fulfilled'], 3)
+
+    def test_invalid_period(self):
+        self.assertEqual(self.client.get('/api/v1/schedules/adherence/', {'period': 'month'}).status_code, 400)
@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+from utility.agenda import local_day_bounds
+from utility.missed_dose_handler import handle_missed_doses
+from utility.scheduler import initial_schedule
+
+
+@override_settings(SHARED_CACHE=True)
+class AgendaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='agenda@example.com', first_name='Agen', last_name='Da', password='securepassword123'
+        )
+        self.medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=30, dosage_per_intake=1, time_interval=8
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, **params):
+        response = self.client.get('/api/v1/schedules/agenda/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_local_day_bounds_use_the_project_time_zone(self):
+        start, end = local_day_bounds(date(2025, 1, 1))
+        self.assertEqual(start, datetime(2024, 12, 31, 23, 0, tzinfo=dt_timezone.utc))  # Lagos is UTC+1
+        self.assertEqual(end - start, timedelta(days=1))
+
+    def test_lists_only_the_doses_of_the_local_day(self):
+        # 23:00 UTC on 31 Dec is midnight in Lagos, 23:00 UTC on 1 Jan is already 2 Jan there
+        for due_at in ('2024-12-31T22:00', '2024-12-31T23:00', '2025-01-01T00:00', '2025-01-01T23:00'):
+            Schedule.objects.create(medication=self.medication,
+                                    next_dose_due_at=datetime.fromisoformat(due_at).replace(tzinfo=dt_timezone.utc))
+
+        data = self.get(date='2025-01-01')
+
+        self.assertEqual(data['date'], '2025-01-01')
+        self.assertEqual([dose['due_at'] for dose in data['doses']],
+                         ['2025-01-01T00:00:00+01:00', '2025-01-01T01:00:00+01:00'])
+
+    def test_cached_until_a_schedule_changes(self):
+        schedule = Schedule.objects.create(medication=self.medication, next_dose_due_at=timezone.now())
+        self.get()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get()['doses'][0]['status'], 'scheduled')
+
+        schedule.mark_as_fulfilled()
+        self.assertEqual(self.get()['doses'][0]['status'], 'fulfilled')
+
+    def test_bulk_paths_refresh_the_agenda(self):
+        Schedule.objects.create(medication=self.medication, next_dose_due_at=timezone.now() - timedelta(hours=2))
+        self.get(date=timezone.localdate().isoformat())
+
+        handle_missed_doses()
+
+        statuses = [dose['status'] for dose in self.get(date=timezone.localdate().isoformat())['doses']]
+        self.assertIn('missed', statuses)
+
+    @override_settings(SCHEDULE_VIRTUAL_RULES=True)
+    def test_includes_rule_doses_once(self):
+        start = datetime.combine(timezone.localdate(), datetime.min.time(), tzinfo=timezone.get_default_timezone())
+        initial_schedule([self.medication], start + timedelta(hours=1))
+        self.medication.schedule_rule.record(start + timedelta(hours=1), 'fulfilled')
+
+        doses = self.get()['doses']
+
+        self.assertEqual([dose['status'] for dose in doses], ['fulfilled', 'scheduled', 'scheduled'])
+        self.assertIsNone(doses[1]['id'])
+
+    def test_invalid_date(self):
+        self.assertEqual(self.client.get('/api/v1/schedules/agenda/', {'date': '2025-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/schedules/agenda/', {'date': 'today'}).status_code, 400)
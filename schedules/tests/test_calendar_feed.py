@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.test import TestCase
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule, ScheduleRule
+from users.models import User
+from utility.calendar_feed import calendar_token, fold
+
+
+class CalendarFeedTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='calendar@example.com', first_name='Cal', last_name='Endar', password='securepassword123'
+        )
+        self.start = datetime(2030, 1, 1, 8, 0, tzinfo=dt_timezone.utc)
+        self.medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A, 500mg', total_quantity=10, dosage_per_intake=1, time_interval=8
+        )
+        Schedule.objects.create(medication=self.medication, next_dose_due_at=self.start)
+        self.url = f'/api/v1/calendar/{calendar_token(self.user)}.ics'
+        self.client = APIClient()
+
+    def feed(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content).decode() if response.status_code == 200 else ''
+        return response, body
+
+    def test_series_is_one_event_with_an_rrule(self):
+        response, body = self.feed()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('DTSTART:20300101T080000Z\r\n', body)
+        self.assertIn('RRULE:FREQ=HOURLY;INTERVAL=8;COUNT=10\r\n', body)
+        self.assertIn('SUMMARY:Take 1 x Drug A\\, 500mg\r\n', body)
+
+    def test_fractional_intervals_use_minutes(self):
+        Medication.objects.filter(pk=self.medication.pk).update(time_interval=None, frequency_per_day=5)
+        self.assertIn('RRULE:FREQ=MINUTELY;INTERVAL=288;COUNT=10', self.feed()[1])
+
+    def test_virtual_rule_with_recorded_doses(self):
+        Schedule.objects.all().delete()
+        rule = ScheduleRule.objects.create(
+            medication=self.medication, anchor=self.start, interval=timedelta(hours=12), count=6
+        )
+        rule.record(self.start + timedelta(hours=12), 'missed')
+
+        body = self.feed()[1]
+
+        self.assertIn('RRULE:FREQ=HOURLY;INTERVAL=12;COUNT=6', body)
+        self.assertIn('EXDATE:20300101T200000Z', body)
+
+    def test_revalidation_returns_not_modified_until_something_changes(self):
+        etag = self.feed()[0]['ETag']
+
+        self.assertEqual(self.feed(HTTP_IF_NONE_MATCH=etag)[0].status_code, 304)
+        Schedule.objects.create(medication=self.medication, next_dose_due_at=self.start + timedelta(hours=8))
+        self.assertEqual(self.feed(HTTP_IF_NONE_MATCH=etag)[0].status_code, 200)
+
+    def test_forged_token_is_not_found(self):
+        self.assertEqual(self.client.get(f'/api/v1/calendar/{self.user.pk}:forged.ics').status_code, 404)
+
+    def test_calendar_url_action(self):
+        self.client.force_authenticate(user=self.user)
+        url = self.client.get('/api/v1/schedules/calendar-url/').data['url']
+        self.assertTrue(url.endswith(self.url))
+
+    def test_rotating_the_key_revokes_the_old_address(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/api/v1/schedules/calendar-url/')
+        self.client.force_authenticate(user=None)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(self.url, response.data['url'])
+        self.assertEqual(self.feed()[0].status_code, 404)
+        self.url = response.data['url'].split('testserver', 1)[1]
+        self.assertEqual(self.feed()[0].status_code, 200)
+
+    def test_each_user_has_their_own_key(self):
+        other = User.objects.create_user(
+            email='other@example.com', first_name='Ot', last_name='Her', password='securepassword123'
+        )
+        self.assertNotEqual(other.calendar_key, self.user.calendar_key)
+
+    def test_long_lines_are_folded_on_character_boundaries(self):
+        line = 'SUMMARY:' + 'é' * 80
+        folded = fold(line)
+
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded.rstrip('\r\n').split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', '').rstrip('\r\n'), line)
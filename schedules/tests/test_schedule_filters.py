@@ -0,0 +1,81 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.filters import filter_schedules
+from schedules.models import Schedule
+from users.models import User
+from utility.query_plan import unindexed_steps
+
+
+class ScheduleFilterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='filters@example.com', first_name='Fil', last_name='Ters', password='securepassword123'
+        )
+        self.drug_a = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=100, dosage_per_intake=1, time_interval=6
+        )
+        self.drug_b = Medication.objects.create(
+            user=self.user, drug_name='Drug B', total_quantity=100, dosage_per_intake=1, time_interval=12
+        )
+        self.now = timezone.now()
+        self.past = [
+            Schedule.objects.create(medication=self.drug_a, next_dose_due_at=self.now - timedelta(hours=hours),
+                                    status=status)
+            for hours, status in ((30, 'fulfilled'), (24, 'missed'), (6, 'fulfilled'))
+        ]
+        self.future = [
+            Schedule.objects.create(medication=medication, next_dose_due_at=self.now + timedelta(hours=hours))
+            for medication, hours in ((self.drug_a, 1), (self.drug_b, 2), (self.drug_a, 7), (self.drug_b, 50))
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def list_ids(self, **params):
+        with self.assertNumQueries(2):  # validators aggregate + one page
+            response = self.client.get('/api/v1/schedules/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_status(self):
+        self.assertEqual(self.list_ids(status='missed,fulfilled'), [schedule.pk for schedule in self.past])
+        self.assertEqual(self.list_ids(status='missed'), [self.past[1].pk])
+
+    def test_medication(self):
+        self.assertEqual(self.list_ids(medication=self.drug_b.pk), [self.future[1].pk, self.future[3].pk])
+
+    def test_due_range(self):
+        ids = self.list_ids(due_after=self.now.isoformat(), due_before=(self.now + timedelta(days=1)).isoformat())
+        self.assertEqual(ids, [schedule.pk for schedule in self.future[:3]])
+
+    def test_upcoming_returns_the_next_n_pending_doses(self):
+        self.assertEqual(self.list_ids(upcoming=2), [self.future[0].pk, self.future[1].pk])
+
+    def test_invalid_filters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/schedules/', {'status': 'lost'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/schedules/', {'due_after': 'tomorrow'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/schedules/', {'upcoming': 0}).status_code, 400)
+
+    def test_filters_are_answered_from_a_per_user_index(self):
+        base = Schedule.objects.filter(user=self.user).order_by('next_dose_due_at', 'id')
+        for filters, index in (
+            ({'status': {'missed'}}, 'schedule_user_status_due_idx (user_id=? AND status=?)'),
+            ({'medication': self.drug_a.pk}, 'schedule_user_cursor_idx (user_id=?)'),
+            ({'due_after': self.now, 'due_before': self.now + timedelta(days=1)},
+             'schedule_user_cursor_idx (user_id=? AND next_dose_due_at>? AND next_dose_due_at<?)'),
+            ({'upcoming': 10}, 'schedule_user_status_due_idx (user_id=? AND status=? AND next_dose_due_at>?)'),
+        ):
+            queryset = filter_schedules(base, filters, now=self.now)[:11]
+            plan = queryset.explain()
+            self.assertEqual(unindexed_steps(queryset), [], f"{filters}: {plan}")
+            self.assertIn(f'SEARCH schedules_schedule USING INDEX {index}', plan)
+
+    def test_todays_agenda_is_one_index_range(self):
+        agenda = filter_schedules(Schedule.objects.filter(user=self.user), {'upcoming': 10}, now=self.now).filter(
+            next_dose_due_at__lt=self.now + timedelta(days=1)
+        )
+        plan = agenda.explain()
+        self.assertEqual(unindexed_steps(agenda), [], plan)
+        self.assertIn('next_dose_due_at>? AND next_dose_due_at<?', plan)
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+
+
+class ScheduleCursorPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='pages@example.com', first_name='Pa', last_name='Ges', password='securepassword123'
+        )
+        medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=500, dosage_per_intake=1, time_interval=1
+        )
+        start = timezone.now()
+        # pairs of doses share a due time, so the id has to break ties
+        Schedule.objects.bulk_create(
+            Schedule(medication=medication, next_dose_due_at=start + timedelta(hours=index // 2))
+            for index in range(120)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_walks_every_schedule_once_in_due_order(self):
+        seen = []
+        url = '/api/v1/schedules/?page_size=25'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend((item['next_dose_due_at'], item['id']) for item in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        first = self.client.get('/api/v1/schedules/?page_size=10').data
+        second = self.client.get(first['next']).data
+
+        self.assertEqual(self.client.get(second['previous']).data['results'], first['results'])
+
+    def test_last_page_costs_the_same_as_the_first(self):
+        def queries_for(url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            return response, len(queries)
+
+        response, first_page = queries_for('/api/v1/schedules/?page_size=10')
+        while response.data['next']:
+            response, last_page = queries_for(response.data['next'])
+
+        self.assertEqual(first_page, last_page)
+
+    def test_page_is_a_range_read_of_the_user_cursor_index_without_a_sort(self):
+        first = self.client.get('/api/v1/schedules/?page_size=10')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+        page_sql = next(query['sql'] for query in queries if 'LIMIT' in query['sql'])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {page_sql}')
+            plan = ' | '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('SEARCH schedules_schedule USING INDEX schedule_user_cursor_idx (user_id=? AND next_dose_due_at>?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
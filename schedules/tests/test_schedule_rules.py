@@ -0,0 +1,155 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from medications.models import Medication
+from reminders.dispatcher import ReminderDispatcher
+from schedules.models import Schedule, ScheduleRule
+from utility.missed_dose_handler import handle_missed_doses
+from utility.scheduler import initial_schedule
+from utility.timeline import expand_rules
+
+
+@override_settings(SCHEDULE_VIRTUAL_RULES=True)
+class ScheduleRuleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='rules@example.com',
+            first_name='Rule',
+            last_name='Based',
+            password='securepassword123',
+            is_verified=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now() + timedelta(hours=1)
+        self.medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=10, dosage_per_intake=2, time_interval=6
+        )
+        initial_schedule([self.medication], self.start)
+        self.rule = ScheduleRule.objects.get(medication=self.medication)
+
+    def get_occurrences(self, horizon='7d'):
+        response = self.client.get('/api/v1/schedules/occurrences/', {'horizon': horizon})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_initial_schedule_stores_a_rule_instead_of_rows(self):
+        self.assertFalse(Schedule.objects.exists())
+        self.assertEqual(
+            (self.rule.anchor, self.rule.interval, self.rule.count),
+            (self.start, timedelta(hours=6), 5),
+        )
+
+    def test_occurrences_are_expanded_lazily_within_the_window(self):
+        occurrences = self.rule.occurrences(self.start + timedelta(hours=7), self.start + timedelta(days=30))
+        self.assertEqual(next(occurrences), self.start + timedelta(hours=12))
+        self.assertEqual(len(list(occurrences)), 2)
+
+    def test_endpoint_merges_virtual_doses_with_recorded_events(self):
+        self.rule.record(self.start + timedelta(hours=6), 'stopped')
+
+        doses = self.get_occurrences()
+
+        self.assertEqual(len(doses), 5)
+        self.assertEqual([dose['status'] for dose in doses].count('stopped'), 1)
+        self.assertEqual(sum(dose['id'] is None for dose in doses), 4)
+        due_times = [dose['next_dose_due_at'] for dose in doses]
+        self.assertEqual(due_times, sorted(due_times))
+
+    def test_editing_the_rule_is_reflected_immediately(self):
+        self.assertEqual(len(self.get_occurrences('1d')), 4)
+
+        self.rule.interval = timedelta(hours=12)
+        self.rule.save()
+
+        self.assertEqual(len(self.get_occurrences('1d')), 2)
+
+    def make_rule(self, anchor, **fields):
+        medication = Medication.objects.create(
+            user=self.user, drug_name='Drug B', total_quantity=10, dosage_per_intake=2, time_interval=6, **fields
+        )
+        initial_schedule([medication], anchor)
+        return medication
+
+    def test_expanded_blocks_are_reused_across_requests(self):
+        expand_rules([self.rule], self.start, self.start + timedelta(days=1))
+
+        with patch.object(ScheduleRule, 'occurrences', side_effect=AssertionError('expanded again')):
+            later = expand_rules([self.rule], self.start + timedelta(minutes=3), self.start + timedelta(days=1))
+
+        self.assertEqual(len(later[self.rule.pk]), 4)
+
+    def test_sweep_stores_overdue_occurrences_as_missed(self):
+        medication = self.make_rule(timezone.now() - timedelta(hours=14))  # due -14h, -8h, -2h, +4h, +10h
+
+        self.assertEqual(handle_missed_doses(), 3)
+        self.assertEqual(handle_missed_doses(), 0)
+
+        medication.refresh_from_db()
+        self.assertEqual(medication.total_left, 4)
+        self.assertEqual(Schedule.objects.filter(medication=medication, status='missed').count(), 3)
+        # the rule keeps the regimen going, no rows are chained after the missed doses
+        self.assertFalse(Schedule.objects.filter(medication=medication, status='scheduled').exists())
+        self.assertEqual(medication.schedule_rule.next_due_at, medication.schedule_rule.anchor + timedelta(hours=18))
+
+    def test_dispatcher_reminds_rule_doses(self):
+        self.make_rule(timezone.now() + timedelta(seconds=30))
+        now = timezone.now().timestamp()
+        sent = []
+        dispatcher = ReminderDispatcher(lookahead=timedelta(minutes=10), notify=sent.extend,
+                                        clock=lambda: now + 60, coalesce_window=timedelta(0))
+
+        dispatcher.run_once()
+
+        self.assertEqual([(dose.pk, dose.medication.drug_name) for dose in sent], [(None, 'Drug B')])
+
+    def test_record_endpoint(self):
+        url = '/api/v1/schedules/record/'
+        due_at = self.start + timedelta(hours=6)
+
+        response = self.client.post(url, {'medication': self.medication.pk, 'due_at': due_at.isoformat(),
+                                          'status': 'fulfilled'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'fulfilled')
+        self.medication.refresh_from_db()
+        self.assertEqual(self.medication.total_left, 8)
+
+        again = self.client.post(url, {'medication': self.medication.pk, 'due_at': due_at.isoformat(),
+                                       'status': 'missed'})
+        self.assertEqual(again.status_code, 400)
+        off_grid = self.client.post(url, {'medication': self.medication.pk,
+                                          'due_at': (due_at + timedelta(hours=1)).isoformat(), 'status': 'missed'})
+        self.assertEqual(off_grid.status_code, 400)
+
+        other = User.objects.create_user(email='other@example.com', first_name='O', last_name='Ther',
+                                         password='securepassword123')
+        self.client.force_authenticate(other)
+        stranger = self.client.post(url, {'medication': self.medication.pk, 'due_at': due_at.isoformat(),
+                                          'status': 'missed'})
+        self.assertEqual(stranger.status_code, 404)
+
+    def test_timeline_projects_rule_doses(self):
+        self.rule.record(self.start + timedelta(hours=6), 'fulfilled')
+
+        response = self.client.get('/api/v1/schedules/timeline/', {'horizon': '1d'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['doses']), 3)
+
+    def test_editing_the_medication_reanchors_the_rule(self):
+        self.medication.drug_name = 'Drug A+'
+        self.medication.save()
+        self.assertEqual(ScheduleRule.objects.get().updated_at, self.rule.updated_at)
+
+        self.medication.time_interval = 12
+        self.medication.save()
+
+        rule = ScheduleRule.objects.get()
+        self.assertEqual((rule.anchor, rule.interval, rule.count), (self.start, timedelta(hours=12), 5))
+        self.medication.refresh_from_db()
+        self.assertEqual(self.medication.runs_out_at, self.start + timedelta(hours=60))
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from medications.models import Medication
+from schedules.models import Schedule
+
+
+class ScheduleTimelineTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='timeline@example.com',
+            first_name='Time',
+            last_name='Line',
+            password='securepassword123',
+            is_verified=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.now = timezone.now()
+
+    def add_medication(self, drug_name, next_dose_due_at, **fields):
+        medication = Medication.objects.create(user=self.user, drug_name=drug_name, **fields)
+        Schedule.objects.create(medication=medication, next_dose_due_at=next_dose_due_at)
+        return medication
+
+    def get_timeline(self, horizon):
+        return self.client.get('/api/v1/schedules/timeline/', {'horizon': horizon})
+
+    def test_projects_doses_in_time_order(self):
+        first_dose = self.now + timedelta(hours=1)
+        self.add_medication('Drug A', first_dose, total_quantity=100, dosage_per_intake=1, time_interval=12)
+        self.add_medication('Drug B', first_dose, total_quantity=100, dosage_per_intake=1, frequency_per_day=1)
+
+        response = self.get_timeline('3d')
+
+        self.assertEqual(response.status_code, 200)
+        names = [dose['medication_name'] for dose in response.data['doses']]
+        self.assertEqual(names.count('Drug A'), 6)
+        self.assertEqual(names.count('Drug B'), 3)
+        due_times = [dose['due_at'] for dose in response.data['doses']]
+        self.assertEqual(due_times, sorted(due_times))
+
+    def test_horizon_is_capped_by_remaining_stock(self):
+        medication = self.add_medication(
+            'Drug A', self.now + timedelta(hours=1), total_quantity=6, dosage_per_intake=2, time_interval=8
+        )
+
+        doses = self.get_timeline('30d').data['doses']
+
+        self.assertEqual(len(doses), 3)
+        self.assertTrue(all(dose['medication_id'] == medication.pk for dose in doses))
+
+    def test_fulfilled_anchor_starts_series_one_interval_later(self):
+        medication = self.add_medication(
+            'Drug A', self.now - timedelta(hours=2), total_quantity=3, dosage_per_intake=1, time_interval=4
+        )
+        Schedule.objects.filter(medication=medication).update(status='fulfilled')
+
+        doses = self.get_timeline('1d').data['doses']
+
+        self.assertEqual(len(doses), 3)
+
+    def test_invalid_horizon(self):
+        self.assertEqual(self.get_timeline('soon').status_code, 400)
+        self.assertEqual(self.get_timeline('900d').status_code, 400)
@@ -2,11 +2,12 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ScheduleViewSet
+from .views import CalendarFeedView, ScheduleViewSet
 
 router = DefaultRouter()
 router.register(r'schedules', ScheduleViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),  # Include the router URLs
+    path('calendar/<str:token>.ics', CalendarFeedView.as_view(), name='schedule-calendar'),  # subscribed feed
 ]
@@ -1,13 +1,233 @@
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
-from .models import Schedule
-from .serializers import ScheduleSerializer
+import heapq
+from datetime import timedelta
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+from django.core import signing
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.cache import get_conditional_response
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from medications.models import Medication
+from utility.agenda import agenda
+from utility.calendar_feed import calendar_token, feed_etag, ics_lines, user_id_for_token
+from utility.conditional import ConditionalListMixin
+from utility.fast_serializers import FastListMixin, ValuesSerializer
+from utility.response_cache import CachedResponseMixin
+from utility.timeline import expand_rules, parse_horizon, project_timeline, with_last_dose
+from .filters import AdherenceFilterSerializer, ScheduleFilterSerializer, filter_schedules
+from .models import ADHERENCE_ROLLUPS, Schedule, ScheduleRule
+from .pagination import ScheduleCursorPagination
+from .serializers import RuleDoseSerializer, ScheduleSerializer
+
+def virtual_doses(rule, due_times, recorded):
+    """Render the occurrences of a schedule rule like serialized Schedule rows.
+
+    Occurrences listed in `recorded` as (medication id, due time) already have a
+    stored row and are skipped.
+    """
+    to_datetime = serializers.DateTimeField().to_representation
+    for due_at in due_times:
+        if (rule.medication_id, due_at) in recorded:
+            continue
+        yield {
+            'id': None,
+            'medication_name': rule.medication.drug_name,
+            'created_at': None,
+            'next_dose_due_at': to_datetime(due_at),
+            'status': 'scheduled',
+        }
+
+
+class ScheduleViewSet(ConditionalListMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Schedule.objects.all()  # Base queryset without filters
     serializer_class = ScheduleSerializer  # Use the Schedule serializer
+    fast_serializer = ValuesSerializer(ScheduleSerializer)  # list path when FAST_LIST_SERIALIZERS is on
     permission_classes = [IsAuthenticated]  # Ensure the user is authenticated
+    pagination_class = ScheduleCursorPagination  # Keyset pages ordered by (next_dose_due_at, id)
+    conditional_fields = ('updated_at', 'medication__updated_at')  # medication_name is serialized too
 
     def get_queryset(self):
         # Optimize the query by fetching related medication in one query using select_related
-        return Schedule.objects.select_related('medication').filter(medication__user=self.request.user)
+        return Schedule.objects.select_related('medication').filter(user=self.request.user)
+
+    def filter_queryset(self, queryset):
+        """Apply ?status=, ?medication=, ?due_after=, ?due_before= and ?upcoming=N to the list."""
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        filters = ScheduleFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        return filter_schedules(queryset, filters.validated_data)
+
+    @action(detail=False, methods=['get'])
+    def timeline(self, request):
+        """Project every future dose of the user's active medications up to ?horizon= (default 30d)."""
+        try:
+            horizon = parse_horizon(request.query_params.get('horizon'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = timezone.now()
+        end = start + horizon
+        medications = with_last_dose(
+            Medication.objects.filter(user=request.user, status='active', schedule_rule__isnull=True)
+        )
+        rules = ScheduleRule.objects.select_related('medication').filter(
+            medication__user=request.user, medication__status='active'
+        )
+        recorded = set(
+            Schedule.objects.filter(
+                medication__user=request.user, medication__schedule_rule__isnull=False,
+                next_dose_due_at__gte=start, next_dose_due_at__lte=end,
+            ).values_list('medication_id', 'next_dose_due_at')
+        )
+        to_datetime = serializers.DateTimeField().to_representation
+        doses = [
+            {
+                'medication_id': medication.pk,
+                'medication_name': medication.drug_name,
+                'dosage_per_intake': medication.dosage_per_intake,
+                'due_at': to_datetime(due_at),
+            }
+            for due_at, medication in project_timeline(medications, start, end, rules, recorded)
+        ]
+        return Response({'start': to_datetime(start), 'end': to_datetime(end), 'doses': doses})
+
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request):
+        """Stored doses merged with the doses expanded from schedule rules, up to ?horizon= (default 7d)."""
+        try:
+            horizon = parse_horizon(request.query_params.get('horizon'), default=timedelta(days=7))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = timezone.now()
+        end = start + horizon
+        stored = list(
+            self.get_queryset().filter(next_dose_due_at__gte=start, next_dose_due_at__lte=end).order_by('next_dose_due_at')
+        )
+        rules = list(
+            ScheduleRule.objects.select_related('medication')
+            .filter(medication__user=request.user, medication__status='active')
+        )
+
+        # occurrences that already have a stored row are represented by that row
+        recorded = {(schedule.medication_id, schedule.next_dose_due_at) for schedule in stored}
+        expanded = expand_rules(rules, start, end)
+        doses = heapq.merge(
+            self.get_serializer(stored, many=True).data,
+            *(virtual_doses(rule, expanded[rule.pk], recorded) for rule in rules),
+            key=lambda dose: dose['next_dose_due_at'],
+        )
+        return Response(list(doses))
+
+    @action(detail=False, methods=['post'])
+    def record(self, request):
+        """Record an event (fulfilled, missed or stopped) for one occurrence of a medication's schedule rule."""
+        serializer = RuleDoseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        medication_id = serializer.validated_data['medication']
+        due_at = serializer.validated_data['due_at']
+
+        rule = ScheduleRule.objects.select_related('medication').filter(
+            medication_id=medication_id, medication__user=request.user
+        ).first()
+        if rule is None:
+            return Response({"error": "This medication has no schedule rule."}, status=status.HTTP_404_NOT_FOUND)
+        if not rule.is_occurrence(due_at):
+            return Response({"due_at": ["Not a dose of this schedule rule."]}, status=status.HTTP_400_BAD_REQUEST)
+        if Schedule.objects.filter(medication_id=medication_id, next_dose_due_at=due_at).exists():
+            return Response({"due_at": ["This dose is already recorded."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        schedule = rule.record(due_at, serializer.validated_data['status'])
+        return Response(ScheduleSerializer(schedule).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='agenda')
+    def day_agenda(self, request):
+        """The user's doses for ?date=YYYY-MM-DD (default: today), with local days in settings.TIME_ZONE."""
+        day = request.query_params.get('date')
+        if day:
+            try:
+                day = parse_date(day)
+            except ValueError:
+                day = None
+            if day is None:
+                return Response({"error": "date must look like YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(agenda(request.user.pk, day))
+
+    @action(detail=False, methods=['get'])
+    def adherence(self, request):
+        """Fulfilled and missed doses per medication and ?period= (day or week), read from the rollup tables.
+
+        Staff may pass ?user= (repeated or comma separated) to read a cohort of patients.
+        """
+        params = AdherenceFilterSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+        rollup = ADHERENCE_ROLLUPS[params['period']]
+
+        if 'user' in params:
+            if not request.user.is_staff:
+                return Response({"error": "Only staff can read other users' adherence."},
+                                status=status.HTTP_403_FORBIDDEN)
+            rows = rollup.objects.filter(user_id__in=params['user'])
+        else:
+            rows = rollup.objects.filter(user=request.user)
+        rows = rows.filter(
+            period_start__gte=rollup.period_for(params['start']), period_start__lte=params['end']
+        )
+        if 'medication' in params:
+            rows = rows.filter(medication_id=params['medication'])
+
+        def ratio(fulfilled, missed):
+            return round(fulfilled / (fulfilled + missed), 4) if fulfilled + missed else None
+
+        data = [
+            {'user_id': user_id, 'medication_id': medication_id, 'period_start': period_start,
+             'fulfilled': fulfilled, 'missed': missed, 'adherence': ratio(fulfilled, missed)}
+            for user_id, medication_id, period_start, fulfilled, missed in rows.order_by(
+                'user_id', 'period_start', 'medication_id'
+            ).values_list('user_id', 'medication_id', 'period_start', 'fulfilled', 'missed')
+        ]
+        fulfilled = sum(row['fulfilled'] for row in data)
+        missed = sum(row['missed'] for row in data)
+        return Response({
+            'period': params['period'], 'start': params['start'], 'end': params['end'],
+            'fulfilled': fulfilled, 'missed': missed, 'adherence': ratio(fulfilled, missed), 'rows': data,
+        })
+
+    @action(detail=False, methods=['get', 'post'], url_path='calendar-url')
+    def calendar_url(self, request):
+        """Return the private address of the user's .ics feed, for subscribing from a calendar app.
+
+        POST replaces the address with a new one; the old address stops working.
+        """
+        if request.method == 'POST':
+            request.user.rotate_calendar_key()
+        path = reverse('schedule-calendar', kwargs={'token': calendar_token(request.user)})
+        return Response({'url': request.build_absolute_uri(path)})
+
+
+class CalendarFeedView(APIView):
+    """Stream a user's doses as an iCalendar feed; the signed token in the URL stands in for a login."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        try:
+            user_id = user_id_for_token(token)
+        except signing.BadSignature as e:
+            raise Http404("Unknown calendar feed") from e
+
+        etag = feed_etag(user_id)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(ics_lines(user_id), content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = 'inline; filename="medtime.ics"'
+        response['ETag'] = etag
+        return response
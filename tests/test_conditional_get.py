@@ -0,0 +1,69 @@
+import time
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='etag@example.com', first_name='E', last_name='Tag', password='securepassword123'
+        )
+        self.medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=10, dosage_per_intake=1, time_interval=8
+        )
+        self.schedule = Schedule.objects.create(
+            medication=self.medication, next_dose_due_at=timezone.now() + timedelta(hours=1)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_unchanged_list_is_not_modified(self):
+        for url in ('/api/v1/medications/', '/api/v1/schedules/'):
+            etag = self.client.get(url)['ETag']
+
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_is_not_trusted_after_a_delete(self):
+        response = self.client.get('/api/v1/schedules/')
+        self.assertNotIn('Last-Modified', response)
+        Schedule.objects.filter(pk=self.schedule.pk).delete()
+
+        response = self.client.get('/api/v1/schedules/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_changes_the_etag(self):
+        etag = self.client.get('/api/v1/medications/')['ETag']
+        self.medication.update_quantity()
+
+        self.assertEqual(self.client.get('/api/v1/medications/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_delete_changes_the_etag(self):
+        Schedule.objects.create(medication=self.medication, next_dose_due_at=timezone.now() - timedelta(hours=1))
+        etag = self.client.get('/api/v1/schedules/')['ETag']
+        Schedule.objects.filter(pk=self.schedule.pk).delete()  # the latest updated_at survives
+
+        response = self.client.get('/api/v1/schedules/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_medication_rename_changes_the_schedule_etag(self):
+        etag = self.client.get('/api/v1/schedules/')['ETag']
+        self.medication.drug_name = 'Drug A forte'
+        self.medication.save()
+
+        self.assertEqual(self.client.get('/api/v1/schedules/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_each_query_string_has_its_own_etag(self):
+        everything = self.client.get('/api/v1/schedules/')['ETag']
+        missed = self.client.get('/api/v1/schedules/?status=missed')['ETag']
+
+        self.assertNotEqual(everything, missed)
@@ -0,0 +1,85 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import MissedDose, Schedule
+from users.models import User
+from utility.exporter import export_lines, history
+
+
+class HistoryExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='export@example.com', first_name='Ex', last_name='Port', password='securepassword123'
+        )
+        other = User.objects.create_user(
+            email='other@example.com', first_name='Ot', last_name='Her', password='securepassword123'
+        )
+        now = timezone.now()
+        for owner in (self.user, other):
+            medication = Medication.objects.create(
+                user=owner, drug_name='Drug A', total_quantity=10, dosage_per_intake=1, time_interval=8
+            )
+            missed = Schedule.objects.create(
+                medication=medication, next_dose_due_at=now - timedelta(hours=8), status='missed', missed_time=now
+            )
+            MissedDose.objects.create(medication=medication, schedule=missed)
+            Schedule.objects.create(medication=medication, next_dose_due_at=now)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_history_covers_every_record_type_of_the_user(self):
+        records = list(history([self.user.pk], chunk_size=1))
+
+        self.assertEqual([record_type for record_type, _ in records],
+                         ['medication', 'schedule', 'schedule', 'missed_dose'])
+        self.assertTrue(all(row['user_id'] == self.user.pk for _, row in records))
+
+    def test_schedules_are_filtered_on_their_own_user_column(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(history([self.user.pk]))
+
+        schedule_query = next(query['sql'] for query in queries if 'FROM "schedules_schedule"' in query['sql'])
+        self.assertNotIn('JOIN', schedule_query)
+
+    def test_endpoint_streams_ndjson(self):
+        response = self.client.get('/api/v1/export/')
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[0]['drug_name'], 'Drug A')
+
+    def test_endpoint_streams_csv(self):
+        response = self.client.get('/api/v1/export/', {'file_format': 'csv'})
+
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['record_type'] for row in rows], ['medication', 'schedule', 'schedule', 'missed_dose'])
+        self.assertEqual(rows[1]['status'], 'missed')
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/export/', {'file_format': 'xml'}).status_code, 400)
+
+    def test_export_is_lazy(self):
+        lines = export_lines(history(), 'ndjson')
+        with self.assertNumQueries(1):
+            next(lines)
+
+    def test_management_command_exports_everyone(self):
+        with tempfile.NamedTemporaryFile(suffix='.ndjson', delete=False) as handle:
+            pass
+        self.addCleanup(os.remove, handle.name)
+
+        call_command('export_history', output=handle.name)
+
+        with open(handle.name, encoding='utf-8') as output:
+            self.assertEqual(len(output.readlines()), 8)
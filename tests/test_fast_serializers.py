@@ -0,0 +1,68 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+
+
+class FastListSerializerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='fast@example.com', first_name='Fa', last_name='St', password='securepassword123'
+        )
+        start = timezone.now()
+        for index, (interval, frequency) in enumerate(((8, None), (None, 3), (12, None))):
+            medication = Medication.objects.create(
+                user=self.user, drug_name=f'Drug {index}', total_quantity=30, dosage_per_intake=1,
+                time_interval=interval, frequency_per_day=frequency, priority_flag=index == 2,
+                priority_lead_time=15 if index == 2 else None,
+            )
+            for hours in range(4):
+                Schedule.objects.create(
+                    medication=medication, next_dose_due_at=start + timedelta(hours=hours, microseconds=index)
+                )
+        Schedule.objects.filter(next_dose_due_at__lt=start + timedelta(hours=1)).update(
+            status='missed', missed_time=start
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def bodies(self, url):
+        with override_settings(FAST_LIST_SERIALIZERS=False):
+            cache.clear()
+            slow = self.client.get(url).content
+        with override_settings(FAST_LIST_SERIALIZERS=True):
+            cache.clear()
+            fast = self.client.get(url).content
+        return slow, fast
+
+    def test_medication_list_is_byte_identical(self):
+        slow, fast = self.bodies('/api/v1/medications/')
+        self.assertEqual(slow, fast)
+
+    def test_schedule_pages_are_byte_identical(self):
+        slow, fast = self.bodies('/api/v1/schedules/?page_size=5')
+        self.assertEqual(slow, fast)
+
+    @override_settings(FAST_LIST_SERIALIZERS=True)
+    def test_fast_cursor_walks_every_schedule(self):
+        seen = []
+        url = '/api/v1/schedules/?page_size=5'
+        while url:
+            response = self.client.get(url).data
+            seen.extend(item['id'] for item in response['results'])
+            url = response['next']
+        self.assertCountEqual(seen, Schedule.objects.values_list('pk', flat=True))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_list_serializers', rows=[50], stdout=out)
+
+        self.assertIn('schedules', out.getvalue())
+        self.assertFalse(User.objects.filter(email='benchmark@example.com').exists())
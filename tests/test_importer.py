@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+from utility.importer import import_medications
+
+
+def ndjson(rows):
+    return ''.join(json.dumps(row) + '\n' for row in rows).encode()
+
+
+def regimen(count):
+    return [{'drug_name': f'Drug {index}', 'total_quantity': 30, 'dosage_per_intake': 1, 'time_interval': 12}
+            for index in range(count)]
+
+
+class MedicationImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='import@example.com', first_name='Im', last_name='Port', password='securepassword123'
+        )
+
+    def test_ndjson_rows_are_created_with_first_doses(self):
+        report = import_medications(self.user, BytesIO(ndjson(regimen(5))), 'ndjson', chunk_size=2)
+
+        self.assertEqual((report.created, report.failed), (5, 0))
+        self.assertEqual(Medication.objects.filter(user=self.user, total_left=30).count(), 5)
+        self.assertEqual(Schedule.objects.filter(medication__user=self.user).count(), 5)
+        self.assertGreater(report.rows_per_second, 0)
+
+    def test_csv_empty_cells_are_treated_as_missing(self):
+        data = (
+            "drug_name,total_quantity,dosage_per_intake,time_interval,frequency_per_day,priority_flag\n"
+            "Drug A,10,1,8,,false\n"
+            "Drug B,10,1,,3,\n"
+        ).encode()
+        report = import_medications(self.user, BytesIO(data), 'csv')
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual(Medication.objects.get(drug_name='Drug B').frequency_per_day, 3)
+
+    def test_bad_rows_are_reported_without_aborting(self):
+        data = ndjson(regimen(2)) + b'{not json\n' + ndjson([{'drug_name': 'No quantity'}]) + ndjson(regimen(1))
+        report = import_medications(self.user, BytesIO(data), 'ndjson')
+
+        self.assertEqual((report.created, report.failed), (3, 2))
+        self.assertEqual([error['row'] for error in report.errors], [3, 4])
+        self.assertIn('total_quantity', report.errors[1]['errors'])
+
+    def test_priority_lead_time_applies_across_chunks(self):
+        priority = {'drug_name': 'Priority', 'total_quantity': 30, 'dosage_per_intake': 1, 'time_interval': 12,
+                    'priority_flag': True, 'priority_lead_time': 30}
+        start = timezone.now().replace(microsecond=0)
+        import_medications(self.user, BytesIO(ndjson(regimen(3) + [priority])), 'ndjson', start, chunk_size=2)
+
+        first_doses = dict(Schedule.objects.values_list('medication__drug_name', 'next_dose_due_at'))
+        self.assertEqual(first_doses['Priority'], start)
+        self.assertEqual({first_doses[f'Drug {index}'] for index in range(3)}, {start + timedelta(minutes=30)})
+
+    def test_queries_grow_with_chunks_not_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            import_medications(self.user, BytesIO(ndjson(regimen(10))), 'ndjson', chunk_size=100)
+        with CaptureQueriesContext(connection) as large:
+            import_medications(self.user, BytesIO(ndjson(regimen(60))), 'ndjson', chunk_size=100)
+
+        self.assertEqual(len(small), len(large))
+
+    def test_import_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        upload = SimpleUploadedFile('regimen.csv', b"drug_name,total_quantity,dosage_per_intake,time_interval\n"
+                                                   b"Drug A,10,1,8\n")
+
+        response = client.post('/api/v1/medications/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.ndjson', delete=False) as handle:
+            handle.write(ndjson(regimen(3)))
+        self.addCleanup(os.remove, handle.name)
+        out = StringIO()
+
+        call_command('import_medications', handle.name, user=self.user.email, stdout=out, stderr=StringIO())
+
+        self.assertIn("Imported 3 medications", out.getvalue())
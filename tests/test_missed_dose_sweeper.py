@@ -0,0 +1,82 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from users.models import User
+from medications.models import Medication
+from schedules.models import MissedDose, Schedule
+from utility.missed_dose_handler import handle_missed_doses
+
+
+class HandleMissedDosesTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name='John',
+            last_name='Doe',
+            email='john.doe@example.com',
+            password='testpassword',
+            is_verified=True
+        )
+        self.overdue = timezone.now() - timedelta(hours=3)
+
+    def make_medication(self, drug_name, total_quantity=10, doses=1, due_at=None):
+        medication = Medication.objects.create(
+            user=self.user,
+            drug_name=drug_name,
+            total_quantity=total_quantity,
+            dosage_per_intake=2,
+            time_interval=8,
+        )
+        for dose in range(doses):
+            Schedule.objects.create(
+                medication=medication,
+                next_dose_due_at=(due_at or self.overdue) - timedelta(hours=8 * dose),
+            )
+        return medication
+
+    def test_sweeps_overdue_doses_in_bulk(self):
+        drug_a = self.make_medication('Drug A', doses=2)
+        drug_b = self.make_medication('Drug B', total_quantity=2)
+        on_time = self.make_medication('Drug C', due_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual(handle_missed_doses(), 3)
+
+        self.assertEqual(Schedule.objects.filter(status='missed').count(), 3)
+        self.assertEqual(MissedDose.objects.count(), 3)
+        drug_a.refresh_from_db()
+        drug_b.refresh_from_db()
+        on_time.refresh_from_db()
+        self.assertEqual((drug_a.total_left, drug_a.status), (6, 'active'))
+        self.assertEqual((drug_b.total_left, drug_b.status), (0, 'completed'))
+        self.assertEqual(on_time.total_left, 10)
+
+        # the regimen continues for medications that still have stock
+        next_dose = Schedule.objects.get(medication=drug_a, status='scheduled')
+        self.assertEqual(next_dose.next_dose_due_at, self.overdue + timedelta(hours=8))
+        self.assertFalse(Schedule.objects.filter(medication=drug_b, status='scheduled').exists())
+
+    def test_next_dose_after_an_outage_is_not_overdue(self):
+        last_dose = self.overdue - timedelta(hours=27)  # 30 hours ago, before the sweeper went down
+        drug_a = self.make_medication('Drug A', due_at=last_dose)
+
+        self.assertEqual(handle_missed_doses(), 1)
+        next_dose = Schedule.objects.get(medication=drug_a, status='scheduled')
+        self.assertEqual(next_dose.next_dose_due_at, last_dose + timedelta(hours=32))
+        # the slots skipped during the outage are not swept as missed doses later
+        self.assertEqual(handle_missed_doses(), 0)
+
+    def test_recent_doses_are_left_alone(self):
+        self.make_medication('Drug A', due_at=timezone.now() - timedelta(minutes=30))
+        self.assertEqual(handle_missed_doses(), 0)
+        self.assertFalse(MissedDose.objects.exists())
+
+    def test_query_count_does_not_grow_with_backlog(self):
+        def sweep_queries(count):
+            for index in range(count):
+                self.make_medication(f'Drug {count}-{index}')
+            with CaptureQueriesContext(connection) as context:
+                handle_missed_doses()
+            return len(context.captured_queries)
+
+        self.assertEqual(sweep_queries(2), sweep_queries(40))
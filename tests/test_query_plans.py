@@ -0,0 +1,52 @@
+from django.test import TestCase
+from django.utils import timezone
+from medications.models import Medication
+from reminders.dispatcher import upcoming_doses
+from schedules.models import rules_due
+from utility.agenda import day_doses, local_day_bounds
+from utility.missed_dose_handler import overdue_doses
+from utility.query_plan import full_table_scans, unindexed_steps
+from utility.scheduler import latest_dose_times
+from utility.timeline import with_last_dose
+
+
+class HotQueryPlanTestCase(TestCase):
+    """The scheduler and sweeper queries must be answered from an index, without scans or temp sorts."""
+
+    def assertNoFullTableScan(self, queryset):
+        self.assertEqual(unindexed_steps(queryset), [], queryset.explain())
+
+    def test_latest_dose_per_medication(self):
+        self.assertNoFullTableScan(latest_dose_times([1, 2, 3]))
+
+    def test_timeline_anchor_subqueries(self):
+        self.assertNoFullTableScan(with_last_dose(Medication.objects.filter(user_id=1, status='active')))
+
+    def test_missed_dose_sweep(self):
+        self.assertNoFullTableScan(overdue_doses(timezone.now()))
+
+    def test_rule_sweep(self):
+        self.assertNoFullTableScan(rules_due(timezone.now()))
+
+    def test_dispatcher_refill(self):
+        now = timezone.now()
+        self.assertNoFullTableScan(upcoming_doses(now, now))
+
+    def test_running_out_this_week(self):
+        self.assertNoFullTableScan(Medication.objects.running_out(timezone.now()))
+
+    def test_agenda_day(self):
+        start, end = local_day_bounds(timezone.localdate())
+        self.assertNoFullTableScan(day_doses(1, start, end))
+
+    def test_detects_full_table_scans(self):
+        self.assertEqual(full_table_scans(Medication.objects.filter(drug_name='Drug A')), ['medications_medication'])
+
+    def test_detects_full_index_scans(self):
+        everyone = Medication.objects.order_by('user_id').values_list('user_id', flat=True)
+        self.assertIn('USING COVERING INDEX', everyone.explain())
+        self.assertEqual(full_table_scans(everyone), ['medications_medication'])
+
+    def test_detects_temp_sorts(self):
+        by_name = Medication.objects.filter(user_id=1).order_by('drug_name')
+        self.assertEqual(unindexed_steps(by_name), ['TEMP B-TREE FOR ORDER BY'])
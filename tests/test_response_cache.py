@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+from utility.missed_dose_handler import handle_missed_doses
+from utility.response_cache import get_or_build, response_cache_stats
+
+
+@override_settings(SHARED_CACHE=True)
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cache@example.com', first_name='Ca', last_name='Che', password='securepassword123'
+        )
+        self.medication = Medication.objects.create(
+            user=self.user, drug_name='Drug A', total_quantity=10, dosage_per_intake=1, time_interval=8
+        )
+        self.schedule = Schedule.objects.create(
+            medication=self.medication, next_dose_due_at=timezone.now() - timedelta(hours=2)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_retrieve_is_served_from_the_cache(self):
+        url = f'/api/v1/medications/{self.medication.pk}/'
+        with self.assertNumQueries(1):
+            first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+
+        self.assertEqual(first.data, second.data)
+
+    def test_list_hit_only_costs_the_validators_query(self):
+        self.client.get('/api/v1/schedules/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/v1/schedules/').status_code, 200)
+
+    def test_save_invalidates_the_users_responses(self):
+        self.client.get('/api/v1/schedules/')
+        self.medication.drug_name = 'Drug A forte'
+        self.medication.save()
+
+        response = self.client.get('/api/v1/schedules/')
+        self.assertEqual(response.data['results'][0]['medication_name'], 'Drug A forte')
+
+    def test_bulk_sweep_invalidates_the_users_responses(self):
+        self.client.get('/api/v1/schedules/')
+        handle_missed_doses()
+
+        statuses = [item['status'] for item in self.client.get('/api/v1/schedules/').data['results']]
+        self.assertIn('missed', statuses)
+
+    def test_write_that_skipped_the_version_bump_is_not_served_with_the_new_etag(self):
+        etag = self.client.get('/api/v1/schedules/')['ETag']
+        # e.g. a write in another process whose bump this process never saw
+        Schedule.objects.filter(pk=self.schedule.pk).update(status='missed', updated_at=timezone.now())
+
+        response = self.client.get('/api/v1/schedules/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['status'], 'missed')
+        self.assertEqual(self.client.get('/api/v1/schedules/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_nothing_is_cached_without_a_shared_cache(self):
+        url = f'/api/v1/medications/{self.medication.pk}/'
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_other_users_are_not_invalidated(self):
+        other = User.objects.create_user(
+            email='other@example.com', first_name='Ot', last_name='Her', password='securepassword123'
+        )
+        self.client.get('/api/v1/medications/')
+        Medication.objects.create(
+            user=other, drug_name='Drug B', total_quantity=10, dosage_per_intake=1, time_interval=8
+        )
+
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/medications/')
+
+    def test_stats_endpoint(self):
+        self.client.get('/api/v1/medications/')
+        self.client.get('/api/v1/medications/')
+        self.assertEqual(self.client.get('/api/v1/cache-stats/').status_code, 403)
+
+        admin = User.objects.create_user(
+            email='admin@example.com', first_name='Ad', last_name='Min', password='securepassword123', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/v1/cache-stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+
+class StampedeProtectionTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_build_once(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_build('stampede', build, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [{'value': 42}] * 8)
+        self.assertEqual(response_cache_stats()['misses'], 8)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from users.models import User
+from medications.models import Medication
+from schedules.models import Schedule
+from utility.scheduler import create_next_schedule, create_next_schedules_bulk
+
+
+class CreateNextSchedulesBulkTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name='John',
+            last_name='Doe',
+            email='john.doe@example.com',
+            password='testpassword',
+            is_verified=True
+        )
+        self.last_dose_time = timezone.now().replace(microsecond=0)
+
+    def make_medications(self, count, **overrides):
+        """Create medications that each already have one schedule."""
+        fields = {
+            'total_quantity': 10,
+            'dosage_per_intake': 1,
+            'time_interval': 8,
+        }
+        fields.update(overrides)
+        medications = []
+        for index in range(count):
+            medication = Medication.objects.create(user=self.user, drug_name=f'Drug {index}', **fields)
+            Schedule.objects.create(medication=medication, next_dose_due_at=self.last_dose_time)
+            medications.append(medication)
+        return medications
+
+    def count_queries(self, medications):
+        with CaptureQueriesContext(connection) as context:
+            create_next_schedules_bulk(medications)
+        return len(context.captured_queries)
+
+    def test_matches_per_medication_scheduler(self):
+        """The batch engine schedules the same times as create_next_schedule."""
+        medications = self.make_medications(2) + self.make_medications(2, time_interval=None, frequency_per_day=3)
+        expected = sorted((m.pk, t) for m, t in create_next_schedule(medications))
+        Schedule.objects.filter(next_dose_due_at__gt=self.last_dose_time).delete()
+
+        created = sorted((m.pk, t) for m, t in create_next_schedules_bulk(medications))
+
+        self.assertEqual(created, expected)
+        self.assertEqual(created[0][1], self.last_dose_time + timedelta(hours=8))
+        self.assertEqual(Schedule.objects.count(), 8)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        """One medication and fifty medications cost the same number of queries."""
+        self.assertEqual(
+            self.count_queries(self.make_medications(1)),
+            self.count_queries(self.make_medications(50)),
+        )
+
+    def test_large_batches_are_read_in_id_chunks(self):
+        """Batches above the IN (...) limit are split, so SQLite never sees too many variables."""
+        medications = self.make_medications(5)
+        Medication.objects.filter(pk__in=[medications[0].pk, medications[3].pk]).update(total_left=0)
+        for medication in medications:
+            medication.refresh_from_db()
+
+        with mock.patch('utility.scheduler.ID_CHUNK_SIZE', 2):
+            created = create_next_schedules_bulk(medications)
+
+        self.assertEqual(sorted(m.pk for m, _ in created), [medications[i].pk for i in (1, 2, 4)])
+        self.assertEqual(Medication.objects.filter(status='completed').count(), 2)
+
+    def test_completed_medications_are_not_scheduled(self):
+        """Medications with no stock left are flagged completed instead of scheduled."""
+        medication = self.make_medications(1)[0]
+        Medication.objects.filter(pk=medication.pk).update(total_left=0)
+        medication.refresh_from_db()
+
+        self.assertEqual(create_next_schedules_bulk([medication]), [])
+        medication.refresh_from_db()
+        self.assertEqual(medication.status, 'completed')
+        self.assertEqual(Schedule.objects.filter(medication=medication).count(), 1)
@@ -0,0 +1,109 @@
+"""JWT authentication that avoids repeating work on every request"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+USER_CACHE_TIMEOUT = 300  # seconds a cached user may be served without a save
+# the user fields authentication and permission checks read; the rest load on first access
+USER_CACHE_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class VerifiedTokenCache:
+    """Bounded, thread-safe LRU of validated tokens keyed by a hash of the raw token.
+
+    The cache is process-local and nothing evicts from it across workers. It
+    only remembers that a token's signature and claims checked out, and that
+    cannot change before the token expires. Everything that can be revoked
+    (an inactive user, a changed password) is checked on every request in
+    get_user, against the shared user cache. Entries expire with their token
+    and never outlive ACCESS_TOKEN_LIFETIME, so a rotated signing key stops
+    being honoured within one token lifetime at most.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, token = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def put(self, key, token, expires_at):
+        expires_at = min(expires_at, time.time() + api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+        with self._lock:
+            self._entries[key] = (expires_at, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(settings.JWT_VERIFIED_TOKEN_CACHE_SIZE)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with a verified-token LRU and a shared user cache.
+
+    A token's signature and claims are checked once per process and reused
+    until the token expires (see VerifiedTokenCache). With a shared cache
+    (settings.SHARED_CACHE) the user's auth fields and a digest of their
+    password are read from it, never the password hash itself, and the
+    post_save/post_delete signals on User evict that entry for every process.
+    Without one the user is read from the database on every request, since a
+    per-process copy would outlive a deactivation done elsewhere.
+    """
+
+    def get_validated_token(self, raw_token):
+        key = hashlib.sha256(raw_token).hexdigest()
+        token = verified_tokens.get(key)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            verified_tokens.put(key, token, token.get('exp', 0))
+        return token
+
+    def get_user(self, validated_token):
+        if not settings.SHARED_CACHE:
+            return super().get_user(validated_token)
+        cached = cache.get(user_cache_key(validated_token.get(api_settings.USER_ID_CLAIM)))
+        if cached is None:
+            user = super().get_user(validated_token)
+            cached = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+            cached['password_digest'] = get_md5_hash_password(user.password)
+            cache.set(user_cache_key(getattr(user, api_settings.USER_ID_FIELD)), cached, USER_CACHE_TIMEOUT)
+            return user
+
+        # the same checks JWTAuthentication runs after its lookup
+        if not cached['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != cached['password_digest']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS, USER_CACHE_FIELDS, [cached[field] for field in USER_CACHE_FIELDS]
+        )
@@ -0,0 +1,170 @@
+"""Bloom filter fast path for refresh token blacklist checks
+
+simplejwt asks the BlacklistedToken table about every refresh token it
+verifies. Almost all of those tokens were never blacklisted, so each process
+keeps a Bloom filter of the blacklisted JTIs and only goes to the database
+when the filter says a JTI might be in it. A Bloom filter has no false
+negatives, so a "no" is always safe to trust.
+
+The filter is loaded from the database on first use and then only reads the
+rows added since its last sync. A logout adds the JTI locally and bumps a
+version counter in the shared cache, which tells the other processes to sync.
+Without a shared cache (settings.SHARED_CACHE) no other process would hear of
+the logout, so the filter is bypassed and every check goes to the database.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+VERSION_KEY = 'jwt:blacklist:version'
+# ids are handed out before commit, so a row can become visible after rows with higher ids;
+# rows blacklisted this recently are read again on the next sync
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+class BloomFilter:
+    """Fixed size Bloom filter sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class BlacklistFilter:
+    """Per-process Bloom filter of blacklisted refresh token JTIs.
+
+    Syncs from the database when the shared version counter moves or the
+    filter is older than `max_age` seconds, whichever comes first. The filter
+    and its resume point are swapped in together, fully loaded, so lookups
+    never need the lock.
+    """
+
+    def __init__(self, capacity=None, error_rate=0.01, max_age=None):
+        self.capacity = capacity or settings.JWT_BLACKLIST_FILTER_CAPACITY
+        self.error_rate = error_rate
+        self.max_age = settings.JWT_BLACKLIST_FILTER_MAX_AGE if max_age is None else max_age
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (filter, id up to which every row is loaded, ids loaded above it)
+            self._state = (None, 0, frozenset())
+            self.version = None
+            self.synced_at = 0
+
+    @property
+    def last_id(self):
+        return self._state[1]
+
+    def _rebuild(self):
+        """Build a new filter large enough for the current blacklist and load it before it is used."""
+        expected = BlacklistedToken.objects.count()
+        bloom = BloomFilter(max(self.capacity, expected * 2), self.error_rate)
+        return (bloom, *self._load_rows(bloom, 0, frozenset()))
+
+    @staticmethod
+    def _load_rows(bloom, last_id, seen):
+        """Add the rows after last_id that are not in `seen` to bloom.
+
+        last_id only moves past rows older than SYNC_OVERLAP; the newer ones are
+        read again next time (and skipped through `seen`), so a row whose
+        transaction commits late is still picked up.
+
+        Returns:
+            tuple: (last_id, seen) to resume from
+        """
+        settled = timezone.now() - SYNC_OVERLAP
+        recent = set()
+        rows = BlacklistedToken.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk', 'token__jti', 'blacklisted_at'
+        )
+        for pk, jti, blacklisted_at in rows.iterator(chunk_size=2000):
+            if pk not in seen:
+                bloom.add(jti)
+            if blacklisted_at < settled and not recent:
+                last_id = pk
+            else:
+                recent.add(pk)
+        return last_id, frozenset(recent)
+
+    def sync(self):
+        """Bring the filter up to date with the BlacklistedToken table."""
+        with self._lock:
+            version = cache.get(VERSION_KEY, 0)
+            bloom, last_id, seen = self._state
+            if bloom is None or bloom.count > bloom.capacity:
+                self._state = self._rebuild()
+            else:
+                # adding only sets bits, so the live filter can take the new rows in place
+                self._state = (bloom, *self._load_rows(bloom, last_id, seen))
+            self.version = version
+            self.synced_at = time.monotonic()
+
+    def _is_stale(self):
+        return (
+            self._state[0] is None
+            or time.monotonic() - self.synced_at > self.max_age
+            or cache.get(VERSION_KEY, 0) != self.version
+        )
+
+    def __contains__(self, jti):
+        """False means jti is definitely not blacklisted; True means ask the database."""
+        if self._is_stale():
+            self.sync()
+        return jti in self._state[0]
+
+    def add(self, jti):
+        """Record a newly blacklisted jti here and tell the other processes to sync."""
+        with self._lock:
+            bloom = self._state[0]
+            if bloom is not None:
+                bloom.add(jti)
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, 1, timeout=None)
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class RefreshToken(tokens.RefreshToken):
+    """RefreshToken that only queries the blacklist for JTIs the filter might hold.
+
+    The filter is only trusted with a shared cache; otherwise every check asks the database.
+    """
+
+    def check_blacklist(self):
+        if not settings.SHARED_CACHE or self.payload[api_settings.JTI_CLAIM] in blacklist_filter:
+            super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
@@ -0,0 +1,41 @@
+"""Delete expired outstanding and blacklisted refresh tokens in small batches"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = ("Delete expired refresh tokens from the token blacklist tables. Works through the "
+            "tables by primary key in short transactions so no write lock is held for long.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Tokens examined per transaction (default: 1000).")
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to sleep between chunks (default: 0.05).")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        last_id = 0
+        purged = 0
+        while True:
+            # walk the primary key, expires_at has no index on these tables
+            chunk = list(
+                OutstandingToken.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', 'expires_at')[:options['chunk_size']]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            expired = [pk for pk, expires_at in chunk if expires_at <= now]
+            if expired:
+                with transaction.atomic():
+                    BlacklistedToken.objects.filter(token_id__in=expired).delete()
+                    OutstandingToken.objects.filter(pk__in=expired).delete()
+                purged += len(expired)
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired tokens."))
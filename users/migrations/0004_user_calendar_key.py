@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:03
+
+import users.models
+from django.db import migrations, models
+
+
+def give_each_user_a_key(apps, schema_editor):
+    """AddField fills existing rows with one default value; every user needs their own key."""
+    User = apps.get_model('users', 'User')
+    for user in User.objects.only('pk').iterator():
+        user.calendar_key = users.models.new_calendar_key()
+        user.save(update_fields=['calendar_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_onetimepassword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='calendar_key',
+            field=models.CharField(default=users.models.new_calendar_key, editable=False, max_length=64),
+        ),
+        migrations.RunPython(give_each_user_a_key, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 """Model for the user"""
+import secrets
 from django.utils import timezone
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
@@ -6,6 +7,11 @@ from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.tokens import RefreshToken
 from .manager import UserManager
 
+def new_calendar_key():
+    """Return a random key for a user's calendar feed address."""
+    return secrets.token_urlsafe(24)
+
+
 # Create your models here.
 class User(AbstractBaseUser, PermissionsMixin):
     """Create a custom User class
@@ -23,6 +29,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     date_joined = models.DateTimeField(auto_now_add=True)
     last_login = models.DateTimeField(auto_now=True)
+    # part of the signed calendar feed token; replacing it revokes every issued feed address
+    calendar_key = models.CharField(max_length=64, default=new_calendar_key, editable=False)
 
     USERNAME_FIELD = 'email'
 
@@ -51,6 +59,11 @@ class User(AbstractBaseUser, PermissionsMixin):
             'access': str(refresh.access_token)  # access token (converted to string)
         }
 
+    def rotate_calendar_key(self):
+        """Replace the calendar feed key, so previously shared feed addresses stop working."""
+        self.calendar_key = new_calendar_key()
+        self.save(update_fields=['calendar_key'])
+
 class OneTimePassword(models.Model):
     """One time password model for saving otp into data for each specific user
     Args:
@@ -0,0 +1,130 @@
+"""Pluggable storage for one time passcodes
+
+The store is chosen with settings.OTP_STORE_BACKEND. CacheOTPStore keeps codes
+in the Django cache, where they expire on their own, and is the default when a
+shared cache is configured; ModelOTPStore keeps the original OneTimePassword
+table behaviour and is used otherwise.
+"""
+import hmac
+from datetime import timedelta
+
+import pyotp
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OneTimePassword
+
+OTP_TTL = timedelta(minutes=5)  # how long a code stays valid
+OTP_RESEND_AFTER = timedelta(minutes=3)  # minimum gap between two codes for a user
+OTP_MAX_ATTEMPTS = 5  # wrong guesses allowed before a code is burned
+
+
+class OTPError(ValueError):
+    """Base class for failed passcode checks"""
+
+
+class OTPInvalid(OTPError):
+    """The passcode does not match"""
+
+
+class OTPExpired(OTPError):
+    """The passcode is too old or was never issued"""
+
+
+class OTPAttemptsExceeded(OTPError):
+    """Too many wrong passcodes were tried"""
+
+
+def generate_otp_secret():
+    """Generates a random secret key and OTP code for OTP generation."""
+    secret = pyotp.random_base32()
+    totp = pyotp.TOTP(secret, interval=int(OTP_TTL.total_seconds()))
+    otp = totp.now()
+    return secret, otp
+
+
+class CacheOTPStore:
+    """Keeps each user's current code in the cache with a native TTL."""
+
+    def _code_key(self, user):
+        return f'otp:code:{user.pk}'
+
+    def _attempts_key(self, user):
+        return f'otp:attempts:{user.pk}'
+
+    def _throttle_key(self, user):
+        return f'otp:throttle:{user.pk}'
+
+    def issue(self, user):
+        """Create a new code for user and return it.
+
+        Raises:
+            ValueError: when the previous code was sent less than OTP_RESEND_AFTER ago
+        """
+        if not cache.add(self._throttle_key(user), True, OTP_RESEND_AFTER.total_seconds()):
+            raise ValueError("An OTP was previously sent. Please check your inbox.")
+        _, otp_code = generate_otp_secret()
+        cache.set(self._code_key(user), otp_code, OTP_TTL.total_seconds())
+        cache.delete(self._attempts_key(user))
+        return otp_code
+
+    def verify(self, user, otp_code):
+        """Check a code, consuming it on success.
+
+        Raises:
+            OTPAttemptsExceeded, OTPExpired or OTPInvalid
+        """
+        attempts_key = self._attempts_key(user)
+        cache.add(attempts_key, 0, OTP_TTL.total_seconds())
+        if cache.incr(attempts_key) > OTP_MAX_ATTEMPTS:
+            cache.delete(self._code_key(user))
+            raise OTPAttemptsExceeded("Too many attempts, please request a new code")
+
+        expected = cache.get(self._code_key(user))
+        if expected is None:
+            raise OTPExpired("OTP has expired")
+        if not hmac.compare_digest(str(expected), str(otp_code)):
+            raise OTPInvalid("Invalid OTP code")
+        cache.delete_many([self._code_key(user), attempts_key, self._throttle_key(user)])
+
+
+class ModelOTPStore:
+    """Keeps codes in the OneTimePassword table (the original behaviour)."""
+
+    def issue(self, user):
+        otp_obj, created = OneTimePassword.objects.get_or_create(user=user)
+
+        if not created:
+            if otp_obj.created_at > timezone.now() - OTP_RESEND_AFTER:
+                raise ValueError("An OTP was previously sent. Please check your inbox.")
+
+        otp_secret, otp_code = generate_otp_secret()
+        otp_obj.otp_secret = otp_secret
+        otp_obj.otp_code = otp_code
+        otp_obj.created_at = timezone.now()
+        otp_obj.save()
+        return otp_code
+
+    def verify(self, user, otp_code):
+        try:
+            otp_obj = OneTimePassword.objects.get(user=user, otp_code=otp_code)
+        except OneTimePassword.DoesNotExist as error:
+            raise OTPInvalid("Invalid OTP code") from error
+
+        # Check if OTP has expired
+        if otp_obj.created_at < timezone.now() - OTP_TTL:
+            otp_obj.delete()
+            raise OTPExpired("OTP has expired")
+
+        # Verify OTP
+        totp = pyotp.TOTP(otp_obj.otp_secret, interval=int(OTP_TTL.total_seconds()))
+        if not totp.verify(otp_code):
+            raise OTPExpired("Invalid or expired OTP code")
+        otp_obj.delete()
+
+
+def get_otp_store():
+    """Return an instance of the configured OTP store."""
+    return import_string(settings.OTP_STORE_BACKEND)()
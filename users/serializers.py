@@ -11,9 +11,11 @@ from django.urls import reverse
 
 
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import TokenError
 from rest_framework.exceptions import AuthenticationFailed
 
+from users.blacklist import RefreshToken
 from users.utils import send_normal_email
 from .models import User
 
@@ -185,16 +187,16 @@ class LogoutUserSerializer(serializers.Serializer):
     }
     
     def validate(self, attrs):
-        refresh_token = attrs.get('refresh_token')
         try:
-            RefreshToken.verify(refresh_token)
-        except Exception as e:
-            raise ValidationError(self.fields['refresh_token'].error_messages['bad_token']) from e
+            self.token = RefreshToken(attrs.get('refresh_token'))  # verifies the token and the blacklist
+        except TokenError:
+            self.fail('bad_token')
         return attrs
     
     def save(self, **kwargs):
-        try:
-            token = RefreshToken(self.token)
-            token.blacklist()  # blacklist the token, more like delete token
-        except TokenError:
-            return self.fail('bad_token')
+        self.token.blacklist()  # blacklist the token, more like delete token
+
+
+class BlacklistFilterTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that checks the blacklist through the Bloom filter first"""
+    token_class = RefreshToken
@@ -0,0 +1,13 @@
+"""Signal handlers for the user model"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache_key
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    """Drop the cached auth fields used by CachedJWTAuthentication whenever a user changes."""
+    cache.delete(user_cache_key(instance.pk))
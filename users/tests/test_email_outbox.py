@@ -0,0 +1,66 @@
+import time
+from unittest.mock import patch
+from django.core import mail
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from users.utils import EmailOutbox, SMTPConnectionPool, email_outbox, mail_pool
+
+
+class EmailOutboxTest(SimpleTestCase):
+    def test_failed_messages_are_retried_with_backoff(self):
+        outbox = EmailOutbox(pool=SMTPConnectionPool(size=1), retry_delay=0.01)
+        attempts = []
+
+        def flaky_deliver(connection, message):
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise ConnectionError("SMTP server unavailable")
+            return 1
+
+        with patch.object(outbox.pool, 'deliver', side_effect=flaky_deliver):
+            outbox.put(mail.EmailMessage("Subject", "Body", "info@example.com", ["user@example.com"]))
+            self.assertTrue(outbox.flush(timeout=5))
+
+        self.assertEqual(len(attempts), 3)
+        self.assertGreaterEqual(attempts[2] - attempts[1], attempts[1] - attempts[0])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RegistrationLatencyBenchmark(TransactionTestCase):
+    """p99 registration time must not depend on how slow the mail server is."""
+    MAIL_DELAY = 0.5
+    REQUESTS = 10
+
+    def setUp(self):
+        cache.clear()
+
+    def register_all(self, prefix, mail_delay):
+        def slow_deliver(connection, message):
+            time.sleep(mail_delay)
+            return 1
+
+        client = APIClient()
+        timings = []
+        with patch.object(mail_pool, 'deliver', side_effect=slow_deliver) as deliver:
+            for index in range(self.REQUESTS):
+                started = time.perf_counter()
+                response = client.post('/api/v1/auth/register/', {
+                    'email': f'{prefix}{index}@example.com',
+                    'first_name': 'Bench',
+                    'last_name': 'Mark',
+                    'password': 'securepassword123',
+                    'confirm_password': 'securepassword123',
+                })
+                timings.append(time.perf_counter() - started)
+                self.assertEqual(response.status_code, 201)
+            email_outbox.flush(timeout=self.REQUESTS * mail_delay + 5)
+        self.assertEqual(deliver.call_count, self.REQUESTS)
+        return sorted(timings)[int(0.99 * (len(timings) - 1))]
+
+    def test_registration_p99_is_independent_of_mail_delay(self):
+        fast_p99 = self.register_all('fast', mail_delay=0)
+        slow_p99 = self.register_all('slow', mail_delay=self.MAIL_DELAY)
+
+        self.assertLess(slow_p99, self.MAIL_DELAY)
+        self.assertLess(slow_p99 - fast_p99, self.MAIL_DELAY / 2)
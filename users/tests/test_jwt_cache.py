@@ -0,0 +1,76 @@
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from users.authentication import verified_tokens
+from users.models import User
+
+
+@override_settings(SHARED_CACHE=True)
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        verified_tokens.clear()
+        self.user = User.objects.create_user(
+            email='jwt@example.com', first_name='Jay', last_name='Wt', password='securepassword123'
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.tokens()['access']}")
+
+    def get_profile(self):
+        return self.client.get('/api/v1/auth/test-profile/')
+
+    def test_user_is_looked_up_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_profile().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_profile().status_code, 200)
+
+    def test_saving_the_user_evicts_the_cached_copy(self):
+        self.get_profile()
+        self.user.first_name = 'Changed'
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_profile().status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_profile()
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.get_profile().status_code, 401)
+
+    def test_verified_tokens_are_kept_no_longer_than_an_access_token_lifetime(self):
+        now = time.time()
+        verified_tokens.put('key', 'token', now + 86400)
+        self.assertEqual(verified_tokens.get('key'), 'token')
+
+        lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        with mock.patch('users.authentication.time.time', return_value=now + lifetime + 1):
+            self.assertIsNone(verified_tokens.get('key'))
+
+    def test_cache_holds_only_the_auth_fields(self):
+        self.get_profile()
+        cached = cache.get(f'auth:user:{self.user.pk}')
+
+        self.assertNotIn('password', cached)
+        self.assertTrue(cached['is_active'])
+
+    def test_deferred_fields_load_on_access(self):
+        self.get_profile()
+        request = self.client.get('/api/v1/auth/test-profile/').wsgi_request
+        self.assertEqual(request.user.email, 'jwt@example.com')
+
+    @override_settings(SHARED_CACHE=False)
+    def test_user_is_read_on_every_request_without_a_shared_cache(self):
+        self.get_profile()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_profile().status_code, 200)
+        self.assertIsNone(cache.get(f'auth:user:{self.user.pk}'))
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(self.get_profile().status_code, 401)
@@ -0,0 +1,104 @@
+import socketserver
+import threading
+from django.core.mail import EmailMessage, get_connection
+from django.test import SimpleTestCase
+from users.utils import SMTPConnectionPool
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for Django's backend, like a local smtpd."""
+
+    def reply(self, text):
+        self.wfile.write(f"{text}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 localhost ready")
+        while line := self.rfile.readline():
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply("250-localhost")
+                self.reply("250 OK")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                    drop = server.drop_every and server.messages % server.drop_every == 0
+                self.reply("250 OK queued")
+                if drop:
+                    return  # hang up without QUIT, like a server enforcing a message limit
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_every=0):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.drop_every = drop_every
+
+
+class SMTPConnectionPoolTest(SimpleTestCase):
+    def start_server(self, **kwargs):
+        server = FakeSMTPServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def make_pool(self, server, size):
+        pool = SMTPConnectionPool(size=size, connection_factory=lambda **kwargs: get_connection(
+            'django.core.mail.backends.smtp.EmailBackend',
+            host='127.0.0.1', port=server.server_address[1],
+            use_tls=False, username='', password='', timeout=5, **kwargs,
+        ))
+        self.addCleanup(pool.close)
+        return pool
+
+    @staticmethod
+    def messages(count):
+        return [EmailMessage("Reminder", "Take your dose", "info@example.com", ["user@example.com"]) for _ in range(count)]
+
+    def test_connections_are_reused_across_batches(self):
+        server = self.start_server()
+        pool = self.make_pool(server, size=2)
+
+        for _ in range(5):
+            self.assertEqual(pool.send_messages(self.messages(10)), 10)
+
+        self.assertEqual(server.messages, 50)
+        self.assertEqual(server.connections, 1)
+
+    def test_concurrent_senders_stay_within_the_pool_size(self):
+        server = self.start_server()
+        pool = self.make_pool(server, size=2)
+
+        threads = [threading.Thread(target=pool.send_messages, args=(self.messages(5),)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(server.messages, 40)
+        self.assertLessEqual(server.connections, 2)
+
+    def test_reconnects_when_the_server_drops_the_connection(self):
+        server = self.start_server(drop_every=3)
+        pool = self.make_pool(server, size=1)
+
+        self.assertEqual(pool.send_messages(self.messages(7)), 7)
+
+        self.assertEqual(server.messages, 7)
+        self.assertEqual(server.connections, 3)
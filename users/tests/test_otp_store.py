@@ -0,0 +1,100 @@
+import pyotp
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import OneTimePassword, User
+from users.otp import (OTP_MAX_ATTEMPTS, CacheOTPStore, ModelOTPStore,
+                       OTPAttemptsExceeded, OTPExpired, OTPInvalid)
+
+
+class OTPStoreTestMixin:
+    store_class = None
+
+    def setUp(self):
+        cache.clear()
+        self.store = self.store_class()
+        self.user = User.objects.create_user(
+            email='otp@example.com', first_name='One', last_name='Time', password='securepassword123'
+        )
+
+    def test_issued_code_verifies_once(self):
+        code = self.store.issue(self.user)
+        self.store.verify(self.user, code)
+        with self.assertRaises((OTPInvalid, OTPExpired)):
+            self.store.verify(self.user, code)
+
+    def test_wrong_code_is_rejected(self):
+        code = self.store.issue(self.user)
+        with self.assertRaises(OTPInvalid):
+            self.store.verify(self.user, '000000' if code != '000000' else '111111')
+
+    def test_resend_is_throttled(self):
+        self.store.issue(self.user)
+        with self.assertRaises(ValueError):
+            self.store.issue(self.user)
+
+
+class CacheOTPStoreTest(OTPStoreTestMixin, TestCase):
+    store_class = CacheOTPStore
+
+    def test_issue_and_verify_never_touch_the_database(self):
+        with self.assertNumQueries(0):
+            code = self.store.issue(self.user)
+            self.store.verify(self.user, code)
+
+    def test_code_is_burned_after_too_many_attempts(self):
+        code = self.store.issue(self.user)
+        for _ in range(OTP_MAX_ATTEMPTS):
+            with self.assertRaises(OTPInvalid):
+                self.store.verify(self.user, 'wrong')
+        with self.assertRaises(OTPAttemptsExceeded):
+            self.store.verify(self.user, code)
+
+    def test_expired_code(self):
+        self.store.issue(self.user)
+        cache.delete(f'otp:code:{self.user.pk}')  # what the cache TTL does after five minutes
+        with self.assertRaises(OTPExpired):
+            self.store.verify(self.user, '123456')
+
+
+class ModelOTPStoreTest(OTPStoreTestMixin, TestCase):
+    store_class = ModelOTPStore
+
+    def test_code_is_stored_as_a_row(self):
+        self.store.issue(self.user)
+        self.assertTrue(OneTimePassword.objects.filter(user=self.user).exists())
+
+    @override_settings(OTP_STORE_BACKEND='users.otp.ModelOTPStore')
+    def test_code_failing_the_totp_check_is_a_bad_request(self):
+        code = self.store.issue(self.user)
+        OneTimePassword.objects.filter(user=self.user).update(otp_secret=pyotp.random_base32())
+
+        response = APIClient().post('/api/v1/auth/verify-email/', {'email': self.user.email, 'otp': code})
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(OTP_STORE_BACKEND='users.otp.CacheOTPStore')
+class VerifyUserEmailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='verify@example.com', first_name='Veri', last_name='Fy', password='securepassword123'
+        )
+        self.client = APIClient()
+
+    def verify(self, otp):
+        return self.client.post('/api/v1/auth/verify-email/', {'email': self.user.email, 'otp': otp})
+
+    def test_verifies_user_with_issued_code(self):
+        code = CacheOTPStore().issue(self.user)
+
+        self.assertEqual(self.verify(code).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+
+    def test_rejects_unknown_code(self):
+        CacheOTPStore().issue(self.user)
+        self.assertEqual(self.verify('wrong').status_code, 404)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_verified)
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.blacklist import VERSION_KEY, BlacklistFilter, BloomFilter, blacklist_filter
+from users.models import User
+
+
+class BloomFilterTest(TestCase):
+    def test_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000)
+        items = [f'jti-{index}' for index in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate_stays_near_target(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for index in range(1000):
+            bloom.add(f'jti-{index}')
+        false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(SHARED_CACHE=True)
+class RefreshBlacklistTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.reset()
+        self.user = User.objects.create_user(
+            email='refresh@example.com', first_name='Re', last_name='Fresh', password='securepassword123'
+        )
+        self.refresh = self.user.tokens()['refresh']
+        self.client = APIClient()
+
+    def refresh_token(self, token):
+        return self.client.post('/api/v1/auth/token/refresh/', {'refresh': token})
+
+    def test_refresh_skips_the_blacklist_query(self):
+        blacklist_filter.sync()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 200)
+
+    def test_logged_out_token_cannot_refresh(self):
+        response = self.client.post('/api/v1/auth/logout/', {'refresh_token': self.refresh})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        response = self.client.post('/api/v1/auth/logout/', {'refresh_token': self.refresh})
+        self.assertEqual(response.status_code, 400)
+
+    def test_tokens_blacklisted_by_another_process_are_picked_up(self):
+        blacklist_filter.sync()
+        RefreshToken(self.refresh).blacklist()  # the stock token class does not update the filter
+        cache.set(VERSION_KEY, cache.get(VERSION_KEY, 0) + 1)
+
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_lookups_during_a_rebuild_use_the_old_filter(self):
+        token = RefreshToken(self.refresh)
+        token.blacklist()
+        blacklist_filter.sync()
+        old = blacklist_filter._state[0]
+        old.count = old.capacity + 1  # full, so the next sync rebuilds
+        seen = []
+        load_rows = BlacklistFilter._load_rows
+
+        def loading(bloom, last_id, loaded):
+            seen.append(token['jti'] in blacklist_filter)  # another request, mid-rebuild
+            return load_rows(bloom, last_id, loaded)
+
+        with mock.patch.object(BlacklistFilter, '_load_rows', staticmethod(loading)), \
+                mock.patch.object(blacklist_filter, '_is_stale', return_value=False):
+            blacklist_filter.sync()
+
+        self.assertEqual(seen, [True])
+        self.assertIsNot(blacklist_filter._state[0], old)
+        self.assertIn(token['jti'], blacklist_filter)
+
+    def test_rows_that_commit_late_below_the_last_id_are_picked_up(self):
+        user_token = OutstandingToken.objects.get(jti=RefreshToken(self.refresh)['jti'])
+        other = OutstandingToken.objects.create(jti='other', token='x', expires_at=timezone.now() + timedelta(days=1))
+        BlacklistedToken.objects.create(pk=10, token=other)
+        blacklist_filter.sync()
+        BlacklistedToken.objects.create(pk=5, token=user_token)  # id taken earlier, committed after the sync
+        cache.set(VERSION_KEY, cache.get(VERSION_KEY, 0) + 1)
+
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        self.assertEqual(blacklist_filter._state[0].count, 2)  # the overlap re-read added nothing twice
+
+    def test_settled_rows_are_not_read_again(self):
+        RefreshToken(self.refresh).blacklist()
+        BlacklistedToken.objects.update(blacklisted_at=timezone.now() - timedelta(hours=1))
+        blacklist_filter.sync()
+
+        self.assertEqual(blacklist_filter.last_id, BlacklistedToken.objects.get().pk)
+
+
+class UnsharedCacheBlacklistTest(TestCase):
+    def test_every_refresh_checks_the_database(self):
+        cache.clear()
+        blacklist_filter.reset()
+        user = User.objects.create_user(
+            email='unshared@example.com', first_name='Un', last_name='Shared', password='securepassword123'
+        )
+        refresh = user.tokens()['refresh']
+        blacklist_filter.sync()
+        RefreshToken(refresh).blacklist()  # logged out in another process; no shared version to bump
+
+        response = APIClient().post('/api/v1/auth/token/refresh/', {'refresh': refresh})
+
+        self.assertEqual(response.status_code, 401)
+
+
+class PurgeExpiredTokensTest(TestCase):
+    def test_only_expired_tokens_are_deleted(self):
+        now = timezone.now()
+        for index in range(5):
+            token = OutstandingToken.objects.create(
+                jti=f'old-{index}', token='x', expires_at=now - timedelta(days=1)
+            )
+            if index % 2:
+                BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(jti='live', token='x', expires_at=now + timedelta(days=1))
+
+        out = StringIO()
+        call_command('purge_expired_tokens', chunk_size=2, pause=0, stdout=out)
+
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertIn("Purged 5", out.getvalue())
@@ -4,40 +4,193 @@
 # to use python package pyotp ( this expires at a particular time)
 # what we want is just a simple otp verification
 
-from datetime import timedelta
-from django.core.mail import EmailMessage
+import heapq
+import itertools
+import logging
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-from django.utils import timezone
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
-import pyotp
-from .models import User, OneTimePassword
+from .models import User
+from .otp import get_otp_store
+
+logger = logging.getLogger(__name__)
+
+class SMTPConnectionPool:
+    """A bounded set of long-lived mail connections shared by every sender.
+
+    Opening an SMTP connection costs a TCP and TLS handshake, so connections
+    are kept open between sends and reused. At most `size` connections exist
+    at once, and a caller that finds none free waits for one. A connection that
+    the server dropped is reopened, and the message it failed on is retried once.
+    """
+
+    def __init__(self, size=None, connection_factory=get_connection):
+        self.size = size or settings.EMAIL_POOL_SIZE
+        self.connection_factory = connection_factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out of the pool for the duration of the block."""
+        self._slots.acquire()
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self.connection_factory(fail_silently=False)
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+            self._slots.release()
+
+    @staticmethod
+    def _reset(connection):
+        """Forget a dead connection so that the next open() reconnects."""
+        try:
+            connection.close()
+        except OSError:  # the socket is already gone
+            connection.connection = None
+
+    def deliver(self, connection, message):
+        """Send one message on a checked-out connection, reconnecting once if it was dropped."""
+        for attempt in range(2):
+            try:
+                connection.open()  # no-op while the connection is alive
+                return connection.send_messages([message])
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._reset(connection)
+                if attempt:
+                    raise
+        return 0
+
+    def send_messages(self, messages, fail_silently=False):
+        """Send a batch of EmailMessage objects over one pooled connection.
+
+        Returns:
+            int: the number of messages sent
+        """
+        sent = 0
+        with self.connection() as connection:
+            for message in messages:
+                try:
+                    sent += self.deliver(connection, message) or 0
+                except Exception:
+                    if not fail_silently:
+                        raise
+        return sent
+
+    def close(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._reset(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+mail_pool = SMTPConnectionPool()
+
+
+class EmailOutbox:
+    """Sends email from a background thread so requests never wait on SMTP.
+
+    Messages are queued in memory and a single worker thread, started on first
+    use, delivers them in batches through the connection pool. A failed message
+    is retried with exponential backoff (retry_delay, 2 * retry_delay, ...) up
+    to max_retries times before it is logged and dropped.
+    """
+
+    def __init__(self, pool=mail_pool, batch_size=50, max_retries=5, retry_delay=2.0):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue()
+        self._retries = []  # heap of (ready_at, seq, attempt, message)
+        self._seq = itertools.count()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def put(self, message):
+        """Queue an EmailMessage for delivery."""
+        with self._idle:
+            self._pending += 1
+        self._queue.put((0, message))
+        self._ensure_worker()
+
+    def flush(self, timeout=None):
+        """Block until every queued message was sent or given up on."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """Wait for work, then collect up to batch_size ready messages."""
+        timeout = max(0, self._retries[0][0] - time.monotonic()) if self._retries else None
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+            _, _, attempt, message = heapq.heappop(self._retries)
+            batch.append((attempt, message))
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            with self.pool.connection() as connection:
+                for attempt, message in batch:
+                    try:
+                        self.pool.deliver(connection, message)
+                    except Exception:  # any delivery failure is retried
+                        if attempt < self.max_retries:
+                            ready_at = time.monotonic() + self.retry_delay * 2 ** attempt
+                            heapq.heappush(self._retries, (ready_at, next(self._seq), attempt + 1, message))
+                            continue
+                        logger.exception("Giving up on email to %s after %s attempts", message.to, attempt + 1)
+                    with self._idle:
+                        self._pending -= 1
+                        self._idle.notify_all()
+
+
+email_outbox = EmailOutbox()
+
+
+def queue_email(message):
+    """Hand an EmailMessage to the background outbox once the current transaction commits."""
+    transaction.on_commit(lambda: email_outbox.put(message))
 
-def generate_otp_secret():
-    """Generates a random secret key and OTP code for OTP generation."""
-    secret = pyotp.random_base32()
-    totp = pyotp.TOTP(secret, interval=300)
-    otp = totp.now()
-    return secret, otp
 
 def send_code_to_user(email):
-    """Send OTP code to user's email using pyotp."""
+    """Issue an OTP code from the configured store and email it to the user."""
     subject = "One Time passcode for Email Verification"
     try:
         user = User.objects.get(email=email)
     except User.DoesNotExist as error:
         raise ValueError(_("User with the specified email does not exist.")) from error
 
-    otp_obj, created = OneTimePassword.objects.get_or_create(user=user)
-
-    if not created:
-        if otp_obj.created_at > timezone.now() - timedelta(minutes=3):
-            raise ValueError("An OTP was previously sent. Please check your inbox.")
-
-    otp_secret, otp_code = generate_otp_secret()
-    otp_obj.otp_secret = otp_secret
-    otp_obj.otp_code = otp_code
-    otp_obj.created_at = timezone.now()
-    otp_obj.save()
+    otp_code = get_otp_store().issue(user)
 
 
     current_site = "MedTime"
@@ -105,19 +258,40 @@ def send_code_to_user(email):
     from_email = settings.DEFAULT_FROM_EMAIL
     d_email = EmailMessage(subject=subject, body=email_body, from_email=from_email, to=[email])
     d_email.content_subtype = "html"  # This is important to ensure the email is sent as HTML
-    d_email.send(fail_silently=True)
-
+    queue_email(d_email)
 
-def send_normal_email(data):
-    """sends email
 
-    Args:
-        data (dict): use the data to send a mail
-    """
-    email = EmailMessage(
+def normal_email(data):
+    """Build the EmailMessage for an email_subject/email_body/to_email dict."""
+    return EmailMessage(
         subject=data['email_subject'],
         body=data['email_body'],
         from_email=settings.EMAIL_HOST_USER,
         to=[data['to_email']]
     )
-    email.send()
+
+
+def send_normal_email(data):
+    """queues an email for background delivery
+
+    Args:
+        data (dict): use the data to send a mail
+    """
+    queue_email(normal_email(data))
+
+
+def send_normal_email_now(data):
+    """Send an email through the connection pool and wait for the result.
+
+    For callers that record what was sent, such as the refill alert job: the
+    background outbox dies with the process, so a queued message is not
+    proof of delivery.
+
+    Returns:
+        bool: whether the message was delivered
+    """
+    try:
+        return bool(mail_pool.send_messages([normal_email(data)]))
+    except Exception:  # reported to the caller, which retries on its next run
+        logger.exception("Could not send email to %s", data['to_email'])
+        return False
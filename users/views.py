@@ -1,8 +1,6 @@
 """Handles the api views for the user model"""
 
 # standard imports
-from datetime import timedelta
-from django.utils import timezone
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import smart_str, DjangoUnicodeDecodeError
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
@@ -14,7 +12,6 @@ from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.permissions import IsAuthenticated, AllowAny
-import pyotp
 
 # import all serializers for user
 from .serializers import (UserRegisterationSerializer, LoginSerializer,
@@ -23,8 +20,9 @@ from .serializers import (UserRegisterationSerializer, LoginSerializer,
                         LogoutUserSerializer
                           )
 
+from .otp import OTPAttemptsExceeded, OTPExpired, OTPInvalid, get_otp_store
 from .utils import send_code_to_user
-from .models import User, OneTimePassword
+from .models import User
 
 # Using class based views, specifically GenericAPIView
 class RegisterUserView(GenericAPIView):
@@ -81,32 +79,23 @@ class VerifyUserEmail(GenericAPIView):
             if user.is_verified:
                 return Response({'message': 'User email is already verified'}, status=status.HTTP_204_NO_CONTENT)
 
-            # Proceed with OTP validation
-            otp_obj = OneTimePassword.objects.get(user=user, otp_code=otp_code)
+            # Proceed with OTP validation, the store consumes the code on success
+            get_otp_store().verify(user, otp_code)
 
-            # Create TOTP object for verification
-            totp = pyotp.TOTP(otp_obj.otp_secret, interval=300)
-
-            # Check if OTP has expired
-            if otp_obj.created_at < timezone.now() - timedelta(minutes=5):
-                otp_obj.delete()
-                return Response({'message': 'OTP has expired'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Verify OTP
-            if not totp.verify(otp_code):
-                return Response({'message': 'Invalid or expired OTP code'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Verify the user and delete OTP after successful verification
+            # Verify the user
             user.is_verified = True
-            otp_obj.delete()
-            user.save()
+            user.save(update_fields=['is_verified'])
 
             return Response({'message': 'Account email verified successfully'}, status=status.HTTP_200_OK)
 
         except User.DoesNotExist:
             return Response({'message': 'Invalid email'}, status=status.HTTP_404_NOT_FOUND)
-        except OneTimePassword.DoesNotExist:
-            return Response({'message': 'Invalid OTP code'}, status=status.HTTP_404_NOT_FOUND)
+        except OTPInvalid as e:
+            return Response({'message': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except OTPExpired as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except OTPAttemptsExceeded as e:
+            return Response({'message': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
         except Exception as e:
             return Response({'message': f'An error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
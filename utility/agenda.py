@@ -0,0 +1,84 @@
+"""A user's doses for one local day, kept ready in the cache
+
+The home screen asks for today's doses on every open. Each (user, local day)
+agenda is built once and cached under the user's response version (see
+utility.response_cache), so the writes that already invalidate the user's
+cached responses (schedule saves, status changes, the bulk paths) also
+retire the agenda, and the next read rebuilds it from one range query on
+the schedule due-time indexes. Day boundaries are midnight in
+settings.TIME_ZONE. Agendas are only cached when settings.SHARED_CACHE is on.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+
+from schedules.models import Schedule, ScheduleRule
+from .response_cache import get_or_build, response_version
+from .timeline import expand_rules
+
+AGENDA_TIMEOUT = 60 * 60 * 24  # seconds; a stale agenda is never read, since its version is gone
+AGENDA_STATUSES = ('scheduled', 'fulfilled', 'missed')
+
+
+def local_day_bounds(day):
+    """[start, end) of a calendar day in the default time zone, as aware datetimes."""
+    zone = timezone.get_default_timezone()
+    return (
+        datetime.combine(day, time.min, tzinfo=zone),
+        datetime.combine(day + timedelta(days=1), time.min, tzinfo=zone),
+    )
+
+
+def day_doses(user_id, start, end):
+    """Stored doses of a user due in [start, end)."""
+    return Schedule.objects.filter(
+        medication__user_id=user_id, next_dose_due_at__gte=start, next_dose_due_at__lt=end,
+        status__in=AGENDA_STATUSES,
+    )
+
+
+def build_agenda(user_id, day):
+    """Every stored and rule-expanded dose of a user due on `day`, in time order."""
+    start, end = local_day_bounds(day)
+    to_datetime = serializers.DateTimeField().to_representation
+    stored = day_doses(user_id, start, end).values_list('pk', 'medication_id', 'medication__drug_name', 'medication__dosage_per_intake',
+                  'next_dose_due_at', 'status')
+    doses = [
+        (due_at, schedule_id, medication_id, drug_name, dosage_per_intake, dose_status)
+        for schedule_id, medication_id, drug_name, dosage_per_intake, due_at, dose_status in stored
+    ]
+
+    rules = {
+        rule.pk: rule for rule in ScheduleRule.objects.select_related('medication')
+        .filter(medication__user_id=user_id, medication__status='active')
+    }
+    if rules:
+        # occurrences that already have a stored row are represented by that row
+        recorded = {(medication_id, due_at) for due_at, _, medication_id, _, _, _ in doses}
+        for rule_id, due_times in expand_rules(rules.values(), start, end - timedelta(microseconds=1)).items():
+            medication = rules[rule_id].medication
+            doses.extend(
+                (due_at, None, medication.pk, medication.drug_name, medication.dosage_per_intake, 'scheduled')
+                for due_at in due_times if (medication.pk, due_at) not in recorded
+            )
+
+    doses.sort(key=lambda dose: (dose[0], dose[2]))
+    return {
+        'date': day.isoformat(),
+        'doses': [
+            {'id': schedule_id, 'medication_id': medication_id, 'medication_name': drug_name,
+             'dosage_per_intake': dosage_per_intake, 'due_at': to_datetime(due_at), 'status': dose_status}
+            for due_at, schedule_id, medication_id, drug_name, dosage_per_intake, dose_status in doses
+        ],
+    }
+
+
+def agenda(user_id, day=None):
+    """The cached agenda of a user for `day` (default: today in settings.TIME_ZONE)."""
+    day = day or timezone.localdate()
+    if not settings.SHARED_CACHE:  # another process's writes could not retire a per-process copy
+        return build_agenda(user_id, day)
+    key = f'agenda:{user_id}:{response_version(user_id)}:{day.isoformat()}'
+    return get_or_build(key, lambda: build_agenda(user_id, day), AGENDA_TIMEOUT)
@@ -0,0 +1,148 @@
+"""iCalendar (RFC 5545) feed of a user's upcoming doses
+
+Each medication's remaining doses are one VEVENT with an RRULE instead of
+one event per dose. The series comes from the medication's ScheduleRule
+when doses are virtual, with its recorded doses as EXDATEs, and otherwise
+from dose_series (the latest Schedule row and the dose interval). Pending
+Schedule rows before the series start are added as single events. The
+feed is produced line by line, so it can be streamed.
+
+Feeds are addressed by a signed token instead of a login, because calendar
+apps cannot send a JWT. The token carries the user's random calendar_key as
+well as their id, so rotating the key revokes every address handed out.
+"""
+from datetime import timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import F
+
+from medications.models import Medication
+from schedules.models import Schedule
+from users.models import User
+from utility.conditional import collection_etag
+from utility.timeline import dose_series, with_last_dose
+
+TOKEN_SALT = 'medtime.calendar-feed'
+DOSE_DURATION = 'PT15M'
+PRODID = '-//MedTime//Dose calendar//EN'
+
+
+def calendar_token(user):
+    """Return the feed token of a user."""
+    return signing.Signer(salt=TOKEN_SALT).sign(f'{user.pk}:{user.calendar_key}')
+
+
+def user_id_for_token(token):
+    """Return the user id in a feed token.
+
+    Raises:
+        signing.BadSignature: when the token was not issued by calendar_token, or
+            the user's calendar key has been rotated since
+    """
+    user_id, _, key = signing.Signer(salt=TOKEN_SALT).unsign(token).partition(':')
+    if not key or not User.objects.filter(pk=user_id, calendar_key=key, is_active=True).exists():
+        raise signing.BadSignature('Calendar key does not match')
+    return int(user_id)
+
+
+def feed_etag(user_id):
+    """ETag of a user's feed from one aggregate over medications and their schedules."""
+    return collection_etag(
+        Medication.objects.filter(user_id=user_id),
+        ('updated_at', 'schedule__updated_at', 'schedule_rule__updated_at'),
+        key=f'calendar:{user_id}',
+    )
+
+
+def ics_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def ics_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces joined by CRLF + space, as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces = []
+    while encoded:
+        limit = 75 if not pieces else 74
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:  # never split a UTF-8 character
+            cut -= 1
+        pieces.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def rrule(interval, count):
+    """RRULE for `count` doses `interval` apart, in the coarsest unit that is exact."""
+    seconds = round(interval.total_seconds())
+    for frequency, unit in (('HOURLY', 3600), ('MINUTELY', 60)):
+        if seconds % unit == 0:
+            return f'RRULE:FREQ={frequency};INTERVAL={seconds // unit};COUNT={count}'
+    return f'RRULE:FREQ=SECONDLY;INTERVAL={seconds};COUNT={count}'
+
+
+def vevent(uid, medication, start, stamp, extra=()):
+    summary = f'Take {medication.dosage_per_intake} x {medication.drug_name}'
+    yield 'BEGIN:VEVENT'
+    yield f'UID:{uid}'
+    yield f'DTSTAMP:{ics_datetime(stamp)}'
+    yield f'DTSTART:{ics_datetime(start)}'
+    yield f'DURATION:{DOSE_DURATION}'
+    yield f'SUMMARY:{ics_text(summary)}'
+    yield from extra
+    yield 'END:VEVENT'
+
+
+def medication_events(medication, pending, recorded):
+    """Content lines of one medication: its dose series and the pending rows before it."""
+    stamp = medication.updated_at
+    rule = getattr(medication, 'schedule_rule', None)
+    if rule is not None:
+        exdates = [f'EXDATE:{ics_datetime(due_at)}' for due_at in recorded]
+        yield from vevent(f'medication-{medication.pk}-rule@medtime', medication, rule.anchor, stamp,
+                          [rrule(rule.interval, rule.count)] + exdates)
+        return
+
+    series = dose_series(medication)
+    for schedule_id, due_at in pending:
+        if series is None or due_at < series[0]:
+            yield from vevent(f'schedule-{schedule_id}@medtime', medication, due_at, stamp)
+    if series is not None:
+        first, interval, remaining = series
+        yield from vevent(f'medication-{medication.pk}-series@medtime', medication, first, stamp,
+                          [rrule(interval, remaining)])
+
+
+def ics_lines(user_id):
+    """Yield the folded content lines of a user's calendar."""
+    medications = with_last_dose(
+        Medication.objects.filter(user_id=user_id, status='active').select_related('schedule_rule')
+    ).order_by('pk')
+    schedules = Schedule.objects.filter(medication__user_id=user_id, medication__status='active')
+    pending = {}
+    for medication_id, schedule_id, due_at in schedules.filter(status='scheduled').order_by(
+        'next_dose_due_at'
+    ).values_list('medication_id', 'pk', 'next_dose_due_at'):
+        pending.setdefault(medication_id, []).append((schedule_id, due_at))
+    # occurrences of a rule that already have an event are excluded from its series
+    recorded = {}
+    for medication_id, due_at in schedules.exclude(status='scheduled').filter(
+        next_dose_due_at__gte=F('medication__schedule_rule__anchor')
+    ).values_list('medication_id', 'next_dose_due_at'):
+        recorded.setdefault(medication_id, []).append(due_at)
+
+    for line in ('BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+                 'X-WR-CALNAME:MedTime doses'):
+        yield fold(line)
+    for medication in medications.iterator():
+        for line in medication_events(medication, pending.get(medication.pk, ()), recorded.get(medication.pk, ())):
+            yield fold(line)
+    yield fold('END:VCALENDAR')
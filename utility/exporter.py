@@ -0,0 +1,107 @@
+"""Streaming export of medication, schedule and missed dose history
+
+Rows are read with .values().iterator(chunk_size=...) and encoded one at a
+time, so an export holds one chunk of rows in memory however much history
+the users have. The same generators feed the export endpoint, through a
+StreamingHttpResponse, and the export_history management command.
+"""
+import csv
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from medications.models import Medication
+from schedules.models import MissedDose, Schedule
+
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+
+# record type -> (model, {output column: queryset field})
+EXPORTS = {
+    'medication': (Medication, {
+        'id': 'id', 'user_id': 'user_id', 'drug_name': 'drug_name', 'total_quantity': 'total_quantity',
+        'total_left': 'total_left', 'dosage_per_intake': 'dosage_per_intake',
+        'frequency_per_day': 'frequency_per_day', 'time_interval': 'time_interval',
+        'priority_flag': 'priority_flag', 'priority_lead_time': 'priority_lead_time', 'status': 'status',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    'schedule': (Schedule, {
+        'id': 'id', 'user_id': 'user_id', 'medication_id': 'medication_id',
+        'next_dose_due_at': 'next_dose_due_at', 'status': 'status', 'fulfilled_time': 'fulfilled_time',
+        'missed_time': 'missed_time', 'stopped_time': 'stopped_time', 'deleted_time': 'deleted_time',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    'missed_dose': (MissedDose, {
+        'id': 'id', 'user_id': 'medication__user_id', 'medication_id': 'medication_id',
+        'schedule_id': 'schedule_id', 'missed_at': 'missed_at',
+    }),
+}
+
+# every column of every record type, in first-seen order, for the shared CSV header
+CSV_COLUMNS = ['record_type'] + list(dict.fromkeys(column for _, columns in EXPORTS.values() for column in columns))
+
+
+def history(user_ids=None, chunk_size=CHUNK_SIZE):
+    """Yield (record type, row dict) for every record of the given users, or of everyone when None."""
+    for record_type, (model, columns) in EXPORTS.items():
+        queryset = model.objects.all()
+        if user_ids is not None:
+            user_field = columns['user_id']
+            queryset = queryset.filter(**{f'{user_field}__in': user_ids})
+        rows = queryset.order_by('pk').values_list(*columns.values())
+        names = list(columns)
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield record_type, dict(zip(names, row))
+
+
+def ndjson_lines(records):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for record_type, row in records:
+        yield encoder.encode({'record_type': record_type, **row}) + '\n'
+
+
+class _Line:
+    """File-like object whose write() hands the CSV line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_COLUMNS)
+    for record_type, row in records:
+        values = {'record_type': record_type, **row}
+        yield writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (values.get(column) for column in CSV_COLUMNS)
+        )
+
+
+def export_lines(records, file_format):
+    """Encode records as NDJSON or CSV lines."""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported format {file_format!r}, expected one of {', '.join(FORMATS)}.")
+    return ndjson_lines(records) if file_format == 'ndjson' else csv_lines(records)
+
+
+class ExportView(APIView):
+    """Stream the authenticated user's full medication history as NDJSON (default) or CSV."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        content_type = 'application/x-ndjson' if file_format == 'ndjson' else 'text/csv'
+        response = StreamingHttpResponse(
+            export_lines(history([request.user.pk]), file_format), content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="medtime-history.{file_format}"'
+        return response
@@ -0,0 +1,75 @@
+"""Read-only list serialization straight from .values()
+
+A ModelSerializer builds a model instance per row and runs every field
+through DRF's field machinery. For long lists, ValuesSerializer reads the
+same columns with .values(), brings related sources such as
+`medication.drug_name` in as annotations, and only converts the columns
+whose representation differs from the database value, which in practice
+means datetimes. The rendered JSON is byte-for-byte the same as the
+ModelSerializer's.
+"""
+from django.conf import settings
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# fields whose to_representation returns the database value unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+class ValuesSerializer:
+    """Serializes querysets like `serializer_class(many=True)`, without model instances."""
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.fields = list(serializer_class().fields.items())
+        self.names = [name for name, _ in self.fields]
+        # related sources ("medication.drug_name") become annotations named after the field
+        self.annotations = {
+            name: F(field.source.replace('.', '__'))
+            for name, field in self.fields
+            if field.source != name and field.source != '*'
+        }
+        self.converters = [
+            (name, field.to_representation)
+            for name, field in self.fields
+            if not isinstance(field, PASSTHROUGH_FIELDS)
+        ]
+
+    def values(self, queryset):
+        """The queryset as dicts holding the raw column values of every serializer field."""
+        return queryset.annotate(**self.annotations).values(*self.names)
+
+    def to_representation(self, rows):
+        """Turn raw value dicts into the serializer's output, in the serializer's field order."""
+        names = self.names
+        converters = self.converters
+        data = []
+        for row in rows:
+            item = {name: row[name] for name in names}
+            for name, convert in converters:
+                if item[name] is not None:
+                    item[name] = convert(item[name])
+            data.append(item)
+        return data
+
+
+class FastListMixin:
+    """Serves a viewset's list through `fast_serializer` when settings.FAST_LIST_SERIALIZERS is on."""
+    fast_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_serializer is None or not settings.FAST_LIST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.fast_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.fast_serializer.to_representation(page))
+        return Response(self.fast_serializer.to_representation(queryset))
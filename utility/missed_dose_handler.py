@@ -1,35 +1,95 @@
-from datetime import timedelta, timezone
-from schedules.models import MissedDose
-from reminders.models import Reminder
+"""Sweep overdue doses into missed doses in bulk"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from medications.models import Medication
+from schedules.models import (
+    MissedDose, Schedule, ScheduleRule, record_adherence, rules_due, unrecorded_occurrences,
+)
+from utility.response_cache import bump_response_version
+from utility.scheduler import create_next_schedules_bulk
+
+# a dose counts as missed once it is this late
+MISSED_AFTER = timedelta(hours=1)
 
-def handle_missed_doses():
-    # Get the current time and calculate the cutoff for missed reminders (1 hour ago)
-    now = timezone.now()
-    missed_cutoff = now - timedelta(hours=1)
 
-    # Query reminders that were sent more than 1 hour ago and are not acknowledged
-    overdue_reminders = Reminder.objects.filter(
-        reminder_time__lte=missed_cutoff,
-        acknowledged=False,
-        missed=False
+def overdue_doses(cutoff):
+    """Pending doses that were due at or before `cutoff`."""
+    return Schedule.objects.filter(status='scheduled', next_dose_due_at__lte=cutoff)
+
+
+def store_overdue_rule_doses(cutoff):
+    """Write the unrecorded rule occurrences due at or before `cutoff` as pending rows.
+
+    The sweep then flips them to missed with the stored doses. Each rule's
+    next_due_at moves past `cutoff`, so an occurrence is only ever stored once.
+    """
+    rules = list(rules_due(cutoff).select_related('medication'))
+    if not rules:
+        return 0
+    start = min(rule.next_due_at for rule in rules)
+    stored = Schedule.objects.bulk_create(
+        Schedule(medication_id=rule.medication_id, user_id=rule.medication.user_id, next_dose_due_at=due_at)
+        for rule, due_at in unrecorded_occurrences(rules, start, cutoff)
     )
+    for rule in rules:
+        rule.next_due_at = rule.occurrence_after(cutoff)
+    ScheduleRule.objects.bulk_update(rules, ['next_due_at'])
+    return len(stored)
+
 
-    for reminder in overdue_reminders:
-        # Mark the reminder as missed
-        reminder.mark_as_missed()
+def handle_missed_doses(grace=MISSED_AFTER):
+    """Mark every overdue scheduled dose as missed in one batch.
 
-        # Create a MissedDose entry and adjust medication quantity
-        missed_dose = MissedDose.objects.create(
-            medication=reminder.schedule.medication,
-            schedule=reminder.schedule
+    All overdue doses are flipped with a single conditional UPDATE, their
+    MissedDose rows are written with one bulk_create and stock is reduced with
+    one F() decrement per group of medications that missed the same number of
+    doses. Overdue occurrences of schedule rules are stored as rows first and
+    swept with them. The adherence rollups are updated in one batch as well,
+    medications without a rule or a pending dose get their next schedule and the
+    run-out forecasts of the affected medications are refreshed.
+
+    Returns:
+        int: the number of doses marked as missed
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        store_overdue_rule_doses(now - grace)
+        # flip the overdue doses, stamping them so this sweep can find exactly its own rows
+        swept = overdue_doses(now - grace).update(
+            status='missed', missed_time=now, updated_at=now
+        )
+        if not swept:
+            return 0
+        missed = list(
+            Schedule.objects.filter(status='missed', missed_time=now)
+            .values_list('pk', 'medication_id', 'medication__user_id', 'next_dose_due_at')
+        )
+
+        MissedDose.objects.bulk_create(
+            MissedDose(schedule_id=schedule_id, medication_id=medication_id)
+            for schedule_id, medication_id, _, _ in missed
+        )
+
+        Medication.objects.apply_dose_events(medication_id for _, medication_id, _, _ in missed)
+        record_adherence(
+            (user_id, medication_id, due_at, 'missed', 1) for _, medication_id, user_id, due_at in missed
         )
-        missed_dose.adjust_medication_quantity()
+        # the bulk writes above send no signals
+        bump_response_version(*(user_id for _, _, user_id, _ in missed))
 
-        # Mark the schedule as missed
-        missed_dose.mark_schedule_as_missed()
+        # keep the regimen going for medications that have no pending dose anymore; the
+        # subquery keeps a large sweep from binding one parameter per medication
+        missed_medication_ids = Schedule.objects.filter(status='missed', missed_time=now).values('medication_id')
+        create_next_schedules_bulk(
+            Medication.objects.filter(pk__in=missed_medication_ids, status='active', schedule_rule__isnull=True)
+            .exclude(schedule__status='scheduled')
+        )
+        Medication.objects.filter(pk__in=missed_medication_ids).refresh_forecasts()
+    return swept
 
-        # Generate the next schedule for the medication (if applicable)
-        reminder.schedule.generate_next_schedule()
 
 if __name__ == "__main__":
     handle_missed_doses()
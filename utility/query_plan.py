@@ -0,0 +1,31 @@
+"""Inspect SQLite query plans of hot querysets"""
+import re
+
+from django.db import connection
+
+# "SCAN <table>", with or without "USING [COVERING] INDEX": a pass over the whole table or index.
+# Only SEARCH steps carry a predicate that bounds the read.
+FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW\b|SUBQUERY\b)(\w+)')
+# rows sorted or grouped after the read because no index gives them in that order
+TEMP_B_TREE = re.compile(r'\bUSE TEMP B-TREE FOR ([A-Z]+(?: BY)?)')
+
+
+def _plan(queryset):
+    if connection.vendor != 'sqlite':
+        raise NotImplementedError("Query plan checks read SQLite query plans only.")
+    return queryset.explain()
+
+
+def full_table_scans(queryset):
+    """Return the tables that `queryset` reads end to end, directly or through one of their indexes.
+
+    Runs EXPLAIN QUERY PLAN on the queryset's SQL, so it only applies to the
+    SQLite backend.
+    """
+    return FULL_SCAN.findall(_plan(queryset))
+
+
+def unindexed_steps(queryset):
+    """Return every step of `queryset`'s plan that an index does not bound: full scans and temp B-tree sorts."""
+    plan = _plan(queryset)
+    return FULL_SCAN.findall(plan) + [f'TEMP B-TREE FOR {use}' for use in TEMP_B_TREE.findall(plan)]
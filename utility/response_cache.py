@@ -0,0 +1,148 @@
+"""Per-user cache of API list and retrieve responses
+
+Each user has a version counter in the cache, and every cached response key
+includes it. Changing anything a user can see bumps that counter (see
+bump_response_version and the signal handlers in medications.signals and
+schedules.signals), so all of the user's old responses become unreachable
+in one cache write. Nothing has to find and delete them, and they simply
+expire.
+
+Concurrent misses for the same key are collapsed: the first request takes a
+short lock and builds the response, and the others wait for it to appear in
+the cache.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+LOCK_TIMEOUT = 10  # seconds a response build may hold the stampede lock
+WAIT_TIMEOUT = 2.0  # seconds a waiting request polls before building the response itself
+WAIT_INTERVAL = 0.05
+
+HITS_KEY = 'responses:stats:hits'
+MISSES_KEY = 'responses:stats:misses'
+
+
+def _version_key(user_id):
+    return f'responses:version:{user_id}'
+
+
+def response_version(user_id):
+    """Current response version of a user."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_response_version(*user_ids):
+    """Invalidate every cached response of the given users.
+
+    Bumps now and again when the transaction commits: a response built from
+    a snapshot taken between the two is stored under a version that is
+    already out of date and is never served.
+    """
+    user_ids = set(user_ids)
+
+    def bump():
+        for user_id in user_ids:
+            _incr(_version_key(user_id))
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def response_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+
+
+def get_or_build(key, build, timeout):
+    """Return the cached value for key, building it once across concurrent misses."""
+    value = cache.get(key)
+    if value is not None:
+        _incr(HITS_KEY)
+        return value
+    _incr(MISSES_KEY)
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+    try:
+        value = build()
+        if value is not None:
+            cache.set(key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+class CachedResponseMixin:
+    """Serves a viewset's list and retrieve responses from the per-user cache.
+
+    Only successful responses are cached, and only their data is stored, so
+    rendering and content negotiation still happen per request. Nothing is
+    cached unless settings.SHARED_CACHE is on. Behind ConditionalListMixin the
+    list's ETag is part of the key, so a body is only served with the ETag it
+    was built under, even when a write elsewhere did not bump the version.
+    """
+
+    def _cached(self, request, build):
+        if not settings.SHARED_CACHE:
+            return build()
+        version = response_version(request.user.pk)
+        path = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False).hexdigest()
+        etag = getattr(self, 'list_etag', '') if self.action == 'list' else ''
+        key = f'responses:{request.user.pk}:{version}:{self.basename}:{self.action}:{path}:{etag}'
+        uncacheable = []
+
+        def build_data():
+            response = build()
+            if response.status_code != 200:
+                uncacheable.append(response)
+                return None
+            return response.data
+
+        data = get_or_build(key, build_data, settings.RESPONSE_CACHE_TIMEOUT)
+        if uncacheable:
+            return uncacheable[0]
+        if data is None:  # someone else's build failed, answer this request directly
+            return build()
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+
+class ResponseCacheStatsView(APIView):
+    """Hit and miss counters of the response cache, for scraping."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache_stats())
@@ -1,10 +1,18 @@
 # scheduler.py from utilities.scheduler import create_next_schedule
+import math
 from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
 from medications.models import Medication
 # from reminders.models import Reminder
 # from reminders.tasks import send_reminder
-from schedules.models import Schedule
+from schedules.models import Schedule, ScheduleRule
+from utility.response_cache import bump_response_version
+
+# ids per IN (...) list, below SQLite's oldest limit of 999 bound variables per statement
+ID_CHUNK_SIZE = 900
 
 
 from datetime import timedelta
@@ -12,39 +20,64 @@ from django.utils import timezone
 from dateutil import parser
 
 
-def initial_schedule(medications, start_time):
-    """Schedule the first doses based on the user's specified start time."""
+def priority_lead_time(medications):
+    """Minutes non-priority first doses wait behind the priority ones (the last priority medication's lead time)."""
+    lead_time = 0
+    for medication in medications:
+        if medication.priority_flag:
+            lead_time = medication.priority_lead_time
+    return lead_time
+
+
+def initial_schedule(medications, start_time, lead_time=None):
+    """Schedule the first doses based on the user's specified start time.
+
+    Non-priority doses start `lead_time` minutes later, worked out from
+    `medications` when not given.
+    """
     current_time = timezone.now()
     next_schedules = []
     
-    # Ensure start_time is a datetime object
-    if isinstance(start_time, str):
+    # Ensure start_time is a datetime object, starting now when none was given
+    if not start_time:
+        start_time = current_time
+    elif isinstance(start_time, str):
         start_time = parser.isoparse(start_time)
 
     # Determine lead time from priority medications
-    priority_lead_time = 0
-    for medication in medications:
-        if medication.priority_flag:
-            priority_lead_time = medication.priority_lead_time
+    if lead_time is None:
+        lead_time = priority_lead_time(medications)
 
     # Schedule the first dose for each medication
     for medication in medications:
         if medication.priority_flag:
             next_time = start_time  # Priority drug starts at user-defined time
         else:
-            next_time = start_time + timedelta(minutes=priority_lead_time)  # Non-priority drug
+            next_time = start_time + timedelta(minutes=lead_time)  # Non-priority drug
 
         # Avoid scheduling for completed medications
         if not medication.is_completed():
             next_schedules.append((medication, next_time))
 
-    # Save the initial schedules
-    for medication, next_dose_due_at in next_schedules:
-        Schedule.objects.create(
-            medication=medication,
-            next_dose_due_at=next_dose_due_at
+    # bulk_create sends no signals, so drop the owners' cached responses here
+    bump_response_version(*(medication.user_id for medication, _ in next_schedules))
+
+    # Save the initial schedules, or a recurrence rule per medication when doses are virtual
+    if settings.SCHEDULE_VIRTUAL_RULES:
+        ScheduleRule.objects.bulk_create(
+            ScheduleRule.for_medication(medication, next_dose_due_at)
+            for medication, next_dose_due_at in next_schedules
         )
-    
+    else:
+        Schedule.objects.bulk_create(
+            Schedule(medication=medication, next_dose_due_at=next_dose_due_at)
+            for medication, next_dose_due_at in next_schedules
+        )
+
+    # forecast when the new medications run out, and keep the in-memory copies in step
+    forecasts = Medication.objects.filter(pk__in=[medication.pk for medication, _ in next_schedules]).refresh_forecasts()
+    for medication, _ in next_schedules:
+        medication.runs_out_at = forecasts.get(medication.pk, medication.runs_out_at)
     return next_schedules
 
 
@@ -84,3 +117,71 @@ def create_next_schedule(medications):
     # # Schedule the reminder email to be sent
     # send_reminder.apply_async((reminder_instance.id,), eta=reminder_instance.scheduled_time)
     return next_schedules
+
+
+def id_chunks(ids):
+    """Split ids into lists of at most ID_CHUNK_SIZE, so each fits in one IN (...) clause."""
+    ids = list(ids)
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+def latest_dose_times(medication_ids):
+    """(medication_id, last dose time) pairs for the given medications, in one grouped query.
+
+    Pass at most ID_CHUNK_SIZE ids; see id_chunks.
+    """
+    return (
+        Schedule.objects.filter(medication_id__in=medication_ids)
+        .values('medication_id')
+        .annotate(last_dose_time=Max('next_dose_due_at'))
+        .values_list('medication_id', 'last_dose_time')
+    )
+
+
+def create_next_schedules_bulk(medications):
+    """Batch variant of create_next_schedule for large sweeps.
+
+    Issues the same number of queries whatever the size of the batch, up to
+    ID_CHUNK_SIZE medications: one grouped query for the latest dose of every
+    medication, one UPDATE for the medications that ran out and one bulk
+    INSERT (split by the database backend's parameter limit) for the new
+    schedules, all in one transaction. Larger batches take one grouped query
+    and one UPDATE per chunk of ids.
+
+    The next dose goes in the first slot of the regimen at or after now. After
+    an outage the slots in between were never reminded, so they are skipped
+    rather than stored overdue and swept as missed doses.
+    """
+    medications = {medication.pk: medication for medication in medications}
+    if not medications:
+        return []
+    now = timezone.now()
+
+    next_schedules = []
+    completed_ids = []
+    last_doses = (row for chunk in id_chunks(medications) for row in latest_dose_times(chunk))
+    for medication_id, last_dose_time in last_doses:
+        medication = medications[medication_id]
+
+        # Avoid scheduling for completed medications
+        if medication.is_completed():
+            medication.status = 'completed'
+            completed_ids.append(medication_id)
+            continue
+
+        interval = medication.dose_interval()
+        if interval is None:
+            continue
+        next_time = last_dose_time + interval
+        if next_time < now:
+            next_time += math.ceil((now - next_time) / interval) * interval
+        next_schedules.append(Schedule(medication=medication, next_dose_due_at=next_time))
+
+    with transaction.atomic():
+        for chunk in id_chunks(completed_ids):
+            Medication.objects.filter(pk__in=chunk).update(status='completed', updated_at=now)
+        Schedule.objects.bulk_create(next_schedules)
+        bump_response_version(*(medication.user_id for medication in medications.values()))
+
+    return [(schedule.medication, schedule.next_dose_due_at) for schedule in next_schedules]
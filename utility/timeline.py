@@ -0,0 +1,124 @@
+"""Project future doses for a set of medications without materializing schedules"""
+import heapq
+import math
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from schedules.models import Schedule
+
+HORIZON_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+MAX_HORIZON = timedelta(days=366)
+RULE_CACHE_TIMEOUT = 60 * 60 * 24  # seconds an expanded block is kept; edits change the key anyway
+RULE_CACHE_BLOCK = timedelta(days=7)  # rules are expanded and cached in fixed, epoch-aligned blocks
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def parse_horizon(value, default=timedelta(days=30)):
+    """Parse a horizon such as '30d', '12h' or '2w' (bare numbers are days)."""
+    if not value:
+        return default
+    match = re.fullmatch(r'\s*(\d+)\s*([hdw]?)\s*', str(value).lower())
+    if not match:
+        raise ValueError("Horizon must look like '30d', '12h' or '2w'.")
+    amount, unit = match.groups()
+    horizon = timedelta(**{HORIZON_UNITS[unit or 'd']: int(amount)})
+    if not timedelta(0) < horizon <= MAX_HORIZON:
+        raise ValueError(f"Horizon must be between 1h and {MAX_HORIZON.days}d.")
+    return horizon
+
+
+def with_last_dose(medications):
+    """Annotate a medication queryset with the time and status of its latest schedule."""
+    latest = Schedule.objects.filter(medication=OuterRef('pk')).order_by('-next_dose_due_at')
+    return medications.annotate(
+        last_dose_time=Subquery(latest.values('next_dose_due_at')[:1]),
+        last_dose_status=Subquery(latest.values('status')[:1]),
+    )
+
+
+def dose_series(medication):
+    """Return (first_dose_time, interval, remaining_doses) for an annotated medication.
+
+    The latest schedule is the anchor: while it is still pending it is the first
+    remaining dose, otherwise the series starts one interval after it. Remaining
+    doses are capped by stock, i.e. total_left // dosage_per_intake.
+    """
+    interval = medication.dose_interval()
+    if medication.last_dose_time is None or interval is None or not medication.total_left:
+        return None
+    first = medication.last_dose_time
+    if medication.last_dose_status != 'scheduled':
+        first += interval
+    return first, interval, medication.total_left // medication.dosage_per_intake
+
+
+def project_medication(medication, start, end):
+    """Yield (due_at, medication) for one medication's doses inside [start, end].
+
+    The index range of in-window doses is computed arithmetically, so only the
+    doses that are actually returned are ever built.
+    """
+    series = dose_series(medication)
+    if series is None:
+        return
+    first, interval, remaining = series
+    first_index = max(0, math.ceil((start - first) / interval))
+    last_index = min(remaining - 1, math.floor((end - first) / interval))
+    for index in range(first_index, last_index + 1):
+        yield first + index * interval, medication
+
+
+def project_rule(rule, due_times, recorded=()):
+    """Yield (due_at, medication) for a rule's expanded due times that have no stored row."""
+    for due_at in due_times:
+        if (rule.medication_id, due_at) not in recorded:
+            yield due_at, rule.medication
+
+
+def project_timeline(medications, start, end, rules=(), recorded=()):
+    """Yield (due_at, medication) for every dose of every medication, in time order.
+
+    Medications with a schedule rule are projected from `rules`, skipping the
+    (medication id, due time) pairs in `recorded`; the others from their latest dose.
+    """
+    rules = list(rules)
+    expanded = expand_rules(rules, start, end)
+    return heapq.merge(
+        *(project_medication(medication, start, end) for medication in medications),
+        *(project_rule(rule, expanded[rule.pk], recorded) for rule in rules),
+        key=lambda dose: dose[0],
+    )
+
+
+def expand_rules(rules, start, end):
+    """Return {rule pk: [due times in [start, end]]} for a set of schedule rules.
+
+    Rules are expanded lazily in fixed blocks of RULE_CACHE_BLOCK aligned to the
+    epoch, so requests made at different times over the same days read the same
+    cache entries. Blocks are cached under the rule's updated_at, so editing a
+    rule simply stops its old entries from being read.
+    """
+    first_block = EPOCH + (start - EPOCH) // RULE_CACHE_BLOCK * RULE_CACHE_BLOCK
+    blocks = []
+    while first_block + len(blocks) * RULE_CACHE_BLOCK <= end:
+        blocks.append(first_block + len(blocks) * RULE_CACHE_BLOCK)
+    keys = {
+        f'schedule-rule:{rule.pk}:{rule.updated_at.timestamp()}:{block.timestamp()}': (rule, block)
+        for rule in rules
+        for block in blocks
+    }
+    expanded = cache.get_many(keys)
+    missing = {
+        key: list(rule.occurrences(block, block + RULE_CACHE_BLOCK - timedelta(microseconds=1)))
+        for key, (rule, block) in keys.items()
+        if key not in expanded
+    }
+    cache.set_many(missing, RULE_CACHE_TIMEOUT)
+    expanded.update(missing)
+    due_times = {rule.pk: [] for rule in rules}
+    for key, (rule, _) in keys.items():  # blocks of a rule are in time order
+        due_times[rule.pk].extend(due_at for due_at in expanded[key] if start <= due_at <= end)
+    return due_times